@@ -4,13 +4,147 @@ ABOUTME: Betty Auto-Documentation Generator - Creates comprehensive docs for new
 ABOUTME: Triggers on significant code changes and generates structured documentation
 """
 
-import json
 import sys
 import os
 from datetime import datetime
 from pathlib import Path
-import hashlib
+from dataclasses import dataclass, field
+from collections import Counter, defaultdict
 import re
+from itertools import islice
+
+from betty_io import load_json_bytes
+
+# Set BETTY_NTFY_DISABLE to skip the "documentation created" notification
+NTFY_DISABLED = bool(os.environ.get('BETTY_NTFY_DISABLE'))
+
+# Languages recorded for written files, by extension
+LANGUAGE_MAP = {
+    '.py': 'Python',
+    '.js': 'JavaScript',
+    '.ts': 'TypeScript',
+    '.jsx': 'React',
+    '.tsx': 'React TypeScript',
+    '.md': 'Markdown',
+    '.json': 'JSON',
+    '.yml': 'YAML',
+    '.yaml': 'YAML',
+    '.sh': 'Shell',
+}
+
+# Extensions scanned for functions, and those always scanned for React components
+FUNCTION_SOURCE_EXTS = frozenset({'.py', '.js', '.ts'})
+COMPONENT_EXTS = frozenset({'.jsx', '.tsx'})
+
+# Source scanners, compiled once at import rather than looked up in re's cache per file
+# Alternatives are fused into one pattern each, so a file is walked once; the name is
+# in whichever group matched
+PY_FUNCTION_PATTERN = re.compile(r'def\s+(\w+)\s*\(')
+JS_FUNCTION_PATTERN = re.compile(
+    r'function\s+(\w+)\s*\('
+    r'|const\s+(\w+)\s*=\s*(?:async\s*)?\([^)]*\)\s*=>'
+)
+
+# Express/FastAPI route declarations: router.get(...), @router.get(...), @app.get(...)
+API_ENDPOINT_PATTERN = re.compile(r'(?:@app|router)\.(get|post|put|delete|patch)\([\'"]([^\'"]+)[\'"]')
+
+# React component declarations
+COMPONENT_PATTERN = re.compile(
+    r'function\s+([A-Z]\w+)\s*\('
+    r'|const\s+([A-Z]\w+)\s*='
+    r'|class\s+([A-Z]\w+)\s+extends\s+'
+    r'|export\s+default\s+(?:function\s+)?([A-Z]\w+)'
+)
+
+# Feature-name phrasing in prompts. Each branch scans the whole prompt before the next is
+# tried, so a build verb anywhere still wins over an earlier fix verb
+FEATURE_NAME_PATTERN = re.compile(
+    r'^(?:.*?(?:add|create|implement|build)\s+(?:a\s+)?(\w+(?:\s+\w+)?)'
+    r'|.*?(?:fix|update|refactor)\s+(?:the\s+)?(\w+(?:\s+\w+)?))',
+    re.IGNORECASE | re.DOTALL
+)
+
+# Error classification by substring of the lowered tool record, first match wins
+ERROR_TYPES = (
+    ('permission', 'Permission Error'),
+    ('not found', 'Not Found Error'),
+    ('syntax', 'Syntax Error'),
+    ('connection', 'Connection Error'),
+    ('timeout', 'Timeout Error'),
+)
+
+# Feature documentation layout; the variable sections are rendered by bullet_block
+FEATURE_DOC_TEMPLATE = """# Feature Documentation: {title}
+
+## Overview
+**Generated**: {generated}
+**Session Duration**: {minutes:.1f} minutes
+**Original Request**: {request}
+
+## What Was Built
+
+### Files Changed
+**Created**: {created_count} files
+**Modified**: {modified_count} files
+**Total Lines Added**: {lines_added}
+
+### Components Added
+{components}{functions}{endpoints}## Files Created
+{files_created}{files_modified}{tests}{languages}
+## Development Pattern
+Tool sequence: `{tool_sequence}`
+
+## Usage
+
+### Prerequisites
+- Ensure all dependencies are installed
+- Check environment variables are set
+- Verify database connections
+
+### Running the Feature
+```bash
+# Add specific commands here based on the feature
+```
+
+### Testing
+{testing}
+## Integration Notes
+
+### Dependencies
+Check if new dependencies were added to package.json or requirements.txt
+
+### Configuration
+Review any configuration changes needed
+
+### Breaking Changes
+⚠️ Review modified files for potential breaking changes
+
+## Additional Notes
+This documentation was auto-generated by Betty based on the session activity.
+For more details, check the individual files or the session logs.
+
+---
+*Generated by Betty Documentation System*
+"""
+RUN_TESTS_HINT = "Run the tests with:\n```bash\nnpm test\n# or\npytest\n```\n"
+NO_TESTS_WARNING = "⚠️ No tests were added for this feature. Consider adding tests.\n"
+
+def bullet_block(header, items, line, footer='', limit=None):
+    """Header, one formatted line per item (up to limit), then footer - or nothing when there are no items"""
+    if not items:
+        return ''
+    return header + ''.join(line.format(item) for item in islice(items, limit)) + footer
+
+@dataclass
+class ToolScan:
+    """Session facts gathered by BettyDocumentationGenerator.scan_tools for the learning report"""
+    tool_count: int = 0
+    tool_patterns: Counter = field(default_factory=Counter)
+    lowered: list = field(default_factory=list)
+    tool_names: set = field(default_factory=set)
+    file_edits: Counter = field(default_factory=Counter)
+    ran_tests: bool = False
+    debug_cycle: bool = False
 
 class BettyDocumentationGenerator:
     def __init__(self):
@@ -19,9 +153,10 @@ class BettyDocumentationGenerator:
         self.features_dir = self.docs_dir / 'features'
         self.reports_dir = self.docs_dir / 'reports'
         
-        # Create directories
-        self.features_dir.mkdir(parents=True, exist_ok=True)
-        self.reports_dir.mkdir(parents=True, exist_ok=True)
+        # Create directories - after the first run they exist, so one stat each is enough
+        for directory in (self.features_dir, self.reports_dir):
+            if not os.path.isdir(directory):
+                os.makedirs(directory, exist_ok=True)
         
         # Thresholds for triggering documentation
         self.thresholds = {
@@ -36,7 +171,7 @@ class BettyDocumentationGenerator:
         """Main entry point - analyzes session for documentation needs"""
         try:
             # Get session data from stdin
-            hook_data = json.load(sys.stdin)
+            hook_data = load_json_bytes(sys.stdin.buffer.read())
             
             # Extract session information
             session_id = hook_data.get('session_id', '')
@@ -89,6 +224,9 @@ class BettyDocumentationGenerator:
             'patterns_used': [],
         }
         
+        # Insertion-ordered set of edited paths, so repeat edits are an O(1) check
+        files_modified = {}
+        
         for tool in tools_used:
             tool_name = tool.get('name', '')
             params = tool.get('params', {})
@@ -100,9 +238,7 @@ class BettyDocumentationGenerator:
                 self.analyze_file_content(file_path, params.get('content', ''), changes)
                 
             elif tool_name in ['Edit', 'MultiEdit']:
-                file_path = params.get('file_path', '')
-                if file_path not in changes['files_modified']:
-                    changes['files_modified'].append(file_path)
+                files_modified[params.get('file_path', '')] = None
                     
             elif tool_name == 'Bash':
                 command = params.get('command', '')
@@ -114,8 +250,8 @@ class BettyDocumentationGenerator:
                     
         # Deduplicate and clean
         changes['languages'] = list(changes['languages'])
-        changes['files_modified'] = [f for f in changes['files_modified'] 
-                                    if f not in changes['files_created']]
+        files_created = set(changes['files_created'])
+        changes['files_modified'] = [f for f in files_modified if f not in files_created]
         
         return changes
     
@@ -124,43 +260,32 @@ class BettyDocumentationGenerator:
         
         # Detect language
         ext = Path(file_path).suffix
-        language_map = {
-            '.py': 'Python',
-            '.js': 'JavaScript',
-            '.ts': 'TypeScript',
-            '.jsx': 'React',
-            '.tsx': 'React TypeScript',
-            '.md': 'Markdown',
-            '.json': 'JSON',
-            '.yml': 'YAML',
-            '.yaml': 'YAML',
-            '.sh': 'Shell',
-        }
-        
-        if ext in language_map:
-            changes['languages'].add(language_map[ext])
+        language = LANGUAGE_MAP.get(ext)
+        if language:
+            changes['languages'].add(language)
         
-        # Count lines
-        lines = content.split('\n')
-        changes['total_lines_added'] += len(lines)
+        # Count lines without materialising them
+        changes['total_lines_added'] += content.count('\n') + 1
         
         # Detect functions/classes
-        if ext in ['.py', '.js', '.ts']:
+        if ext in FUNCTION_SOURCE_EXTS:
             functions = self.extract_functions(content, ext)
             changes['functions_added'].extend(functions)
         
-        # Detect API endpoints
-        if 'router' in content.lower() or '@app' in content:
+        # Detect API endpoints - every route pattern needs a literal 'router.' or '@app.',
+        # so probe for those instead of lowercasing a copy of the whole file
+        if 'router.' in content or '@app.' in content:
             endpoints = self.extract_api_endpoints(content)
             changes['api_endpoints'].extend(endpoints)
         
         # Detect React components
-        if ext in ['.jsx', '.tsx'] or 'React' in content:
+        if ext in COMPONENT_EXTS or 'React' in content:
             components = self.extract_components(content)
             changes['components'].extend(components)
         
         # Detect tests
-        if 'test' in file_path.lower() or 'spec' in file_path.lower():
+        lowered_path = file_path.lower()
+        if 'test' in lowered_path or 'spec' in lowered_path:
             changes['tests_added'].append(file_path)
     
     def extract_functions(self, content, ext):
@@ -169,57 +294,25 @@ class BettyDocumentationGenerator:
         
         if ext == '.py':
             # Python functions
-            pattern = r'def\s+(\w+)\s*\('
-            functions = re.findall(pattern, content)
+            functions = PY_FUNCTION_PATTERN.findall(content)
         elif ext in ['.js', '.ts']:
             # JavaScript/TypeScript functions
-            patterns = [
-                r'function\s+(\w+)\s*\(',
-                r'const\s+(\w+)\s*=\s*\([^)]*\)\s*=>',
-                r'const\s+(\w+)\s*=\s*async\s*\([^)]*\)\s*=>',
-            ]
-            for pattern in patterns:
-                functions.extend(re.findall(pattern, content))
+            functions = [match[match.lastindex] for match in JS_FUNCTION_PATTERN.finditer(content)]
         
         return functions
     
     def extract_api_endpoints(self, content):
         """Extract API endpoints from code"""
-        endpoints = []
-        
         # Express/FastAPI patterns
-        patterns = [
-            r'router\.(get|post|put|delete|patch)\([\'"]([^\'"]+)[\'"]',
-            r'@app\.(get|post|put|delete|patch)\([\'"]([^\'"]+)[\'"]',
-            r'@router\.(get|post|put|delete|patch)\([\'"]([^\'"]+)[\'"]',
-        ]
-        
-        for pattern in patterns:
-            matches = re.findall(pattern, content)
-            for match in matches:
-                if isinstance(match, tuple):
-                    endpoints.append(f"{match[0].upper()} {match[1]}")
-                else:
-                    endpoints.append(match)
-        
-        return endpoints
+        return [f"{verb.upper()} {path}" for verb, path in API_ENDPOINT_PATTERN.findall(content)]
     
     def extract_components(self, content):
         """Extract React component names"""
-        components = []
         
         # React component patterns
-        patterns = [
-            r'function\s+([A-Z]\w+)\s*\(',
-            r'const\s+([A-Z]\w+)\s*=',
-            r'class\s+([A-Z]\w+)\s+extends\s+',
-            r'export\s+default\s+(?:function\s+)?([A-Z]\w+)',
-        ]
+        components = (match[match.lastindex] for match in COMPONENT_PATTERN.finditer(content))
         
-        for pattern in patterns:
-            components.extend(re.findall(pattern, content))
-        
-        return list(set(components))  # Deduplicate
+        return list(dict.fromkeys(components))  # Deduplicate, keeping source order
     
     def needs_documentation(self, changes):
         """Determine if changes warrant documentation"""
@@ -253,121 +346,37 @@ class BettyDocumentationGenerator:
         
         # Create feature name from prompt
         feature_name = self.extract_feature_name(prompt)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        # One clock read for both the filename and the displayed time
+        now = datetime.now()
+        timestamp = now.strftime('%Y%m%d_%H%M%S')
         filename = f"{feature_name}_{timestamp}.md"
         doc_path = self.features_dir / filename
         
         # Generate documentation content
-        content = f"""# Feature Documentation: {feature_name.replace('_', ' ').title()}
-
-## Overview
-**Generated**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-**Session Duration**: {duration / 60000:.1f} minutes
-**Original Request**: {prompt[:500]}
-
-## What Was Built
-
-### Files Changed
-**Created**: {len(changes['files_created'])} files
-**Modified**: {len(changes['files_modified'])} files
-**Total Lines Added**: {changes['total_lines_added']}
-
-### Components Added
-"""
-        
-        # List new components
-        if changes['components']:
-            content += f"**React Components** ({len(changes['components'])}):\n"
-            for component in changes['components']:
-                content += f"- `{component}`\n"
-            content += "\n"
-        
-        # List new functions
-        if changes['functions_added']:
-            content += f"**Functions** ({len(changes['functions_added'])}):\n"
-            for func in changes['functions_added'][:20]:  # Limit to 20
-                content += f"- `{func}()`\n"
-            content += "\n"
-        
-        # List API endpoints
-        if changes['api_endpoints']:
-            content += f"**API Endpoints** ({len(changes['api_endpoints'])}):\n"
-            for endpoint in changes['api_endpoints']:
-                content += f"- `{endpoint}`\n"
-            content += "\n"
-        
-        # File details
-        content += "## Files Created\n"
-        for file_path in changes['files_created'][:20]:  # Limit to 20
-            content += f"- `{file_path}`\n"
-        
-        if changes['files_modified']:
-            content += "\n## Files Modified\n"
-            for file_path in changes['files_modified'][:20]:
-                content += f"- `{file_path}`\n"
-        
-        # Tests
-        if changes['tests_added']:
-            content += f"\n## Tests Added\n"
-            for test_file in changes['tests_added']:
-                content += f"- `{test_file}`\n"
-        
-        # Languages used
-        if changes['languages']:
-            content += f"\n## Technologies Used\n"
-            for lang in changes['languages']:
-                content += f"- {lang}\n"
-        
-        # Tool usage pattern
-        content += f"\n## Development Pattern\n"
-        tool_sequence = self.extract_tool_pattern(tools_used)
-        content += f"Tool sequence: `{tool_sequence}`\n"
-        
-        # How to use
-        content += """
-## Usage
-
-### Prerequisites
-- Ensure all dependencies are installed
-- Check environment variables are set
-- Verify database connections
-
-### Running the Feature
-```bash
-# Add specific commands here based on the feature
-```
-
-### Testing
-"""
-        if changes['tests_added']:
-            content += "Run the tests with:\n```bash\nnpm test\n# or\npytest\n```\n"
-        else:
-            content += "⚠️ No tests were added for this feature. Consider adding tests.\n"
-        
-        # Integration notes
-        content += """
-## Integration Notes
-
-### Dependencies
-Check if new dependencies were added to package.json or requirements.txt
-
-### Configuration
-Review any configuration changes needed
-
-### Breaking Changes
-⚠️ Review modified files for potential breaking changes
-
-## Additional Notes
-This documentation was auto-generated by Betty based on the session activity.
-For more details, check the individual files or the session logs.
-
----
-*Generated by Betty Documentation System*
-"""
+        content = FEATURE_DOC_TEMPLATE.format(
+            title=feature_name.replace('_', ' ').title(),
+            generated=now.isoformat(sep=' ', timespec='seconds'),
+            minutes=duration / 60000,
+            request=prompt[:500],
+            created_count=len(changes['files_created']),
+            modified_count=len(changes['files_modified']),
+            lines_added=changes['total_lines_added'],
+            components=bullet_block(f"**React Components** ({len(changes['components'])}):\n",
+                                    changes['components'], "- `{}`\n", "\n"),
+            functions=bullet_block(f"**Functions** ({len(changes['functions_added'])}):\n",
+                                   changes['functions_added'], "- `{}()`\n", "\n", limit=20),
+            endpoints=bullet_block(f"**API Endpoints** ({len(changes['api_endpoints'])}):\n",
+                                   changes['api_endpoints'], "- `{}`\n", "\n"),
+            files_created=bullet_block("", changes['files_created'], "- `{}`\n", limit=20),
+            files_modified=bullet_block("\n## Files Modified\n", changes['files_modified'], "- `{}`\n", limit=20),
+            tests=bullet_block("\n## Tests Added\n", changes['tests_added'], "- `{}`\n"),
+            languages=bullet_block("\n## Technologies Used\n", changes['languages'], "- {}\n"),
+            tool_sequence=self.extract_tool_pattern(tools_used),
+            testing=RUN_TESTS_HINT if changes['tests_added'] else NO_TESTS_WARNING,
+        )
         
         # Write documentation
-        with open(doc_path, 'w') as f:
-            f.write(content)
+        doc_path.write_text(content, encoding='utf-8')
         
         return doc_path
     
@@ -375,16 +384,10 @@ For more details, check the individual files or the session logs.
         """Extract a feature name from the prompt"""
         
         # Common patterns
-        patterns = [
-            r'(?:add|create|implement|build)\s+(?:a\s+)?(\w+(?:\s+\w+)?)',
-            r'(?:fix|update|refactor)\s+(?:the\s+)?(\w+(?:\s+\w+)?)',
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, prompt.lower())
-            if match:
-                name = match.group(1).replace(' ', '_')
-                return name[:50]  # Limit length
+        match = FEATURE_NAME_PATTERN.search(prompt)
+        if match:
+            name = match[match.lastindex].lower().replace(' ', '_')
+            return name[:50]  # Limit length
         
         # Fallback: use first few words
         words = prompt.split()[:3]
@@ -392,11 +395,7 @@ For more details, check the individual files or the session logs.
     
     def extract_tool_pattern(self, tools_used):
         """Extract tool usage pattern"""
-        sequence = []
-        for tool in tools_used[:10]:  # First 10 tools
-            sequence.append(tool.get('name', 'Unknown'))
-        
-        return ' → '.join(sequence)
+        return ' → '.join(tool.get('name', 'Unknown') for tool in islice(tools_used, 10))  # First 10 tools
     
     def extract_deleted_files(self, command, changes):
         """Try to extract deleted files from rm command"""
@@ -419,66 +418,76 @@ For more details, check the individual files or the session logs.
         if len(tools_used) > 20:
             return True
         
-        # Check for error resolution patterns
-        had_errors = any('error' in str(t).lower() for t in tools_used[:len(tools_used)//2])
-        resolved = any('success' in str(t).lower() or 'complete' in str(t).lower() 
-                      for t in tools_used[len(tools_used)//2:])
-        
-        if had_errors and resolved:
-            return True
+        # Check for error resolution patterns: an error in the first half of the session,
+        # then a success in the second. One pass, each tool stringified at most once
+        half = len(tools_used) // 2
+        had_errors = False
+        for i, tool in enumerate(tools_used):
+            if i < half:
+                if not had_errors and 'error' in str(tool).lower():
+                    had_errors = True
+            elif not had_errors:
+                return False
+            else:
+                tool_str = str(tool).lower()
+                if 'success' in tool_str or 'complete' in tool_str:
+                    return True
         
         return False
     
     def generate_learning_report(self, tools_used, duration):
         """Generate a learning report"""
         
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        # One clock read for both the filename and the displayed time
+        now = datetime.now()
+        timestamp = now.strftime('%Y%m%d_%H%M%S')
         filename = f"learning_report_{timestamp}.md"
         report_path = self.reports_dir / filename
         
-        # Analyze patterns
-        patterns = self.analyze_patterns(tools_used)
-        errors = self.analyze_errors(tools_used)
+        # Analyze patterns from a single walk over the tools
+        scan = self.scan_tools(tools_used)
+        patterns = self.analyze_patterns(scan)
+        errors = self.analyze_errors(scan)
         
-        content = f"""# Betty Learning Report
+        parts = [f"""# Betty Learning Report
 
 ## Session Summary
-**Date**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+**Date**: {now.isoformat(sep=' ', timespec='seconds')}
 **Duration**: {duration / 60000:.1f} minutes
 **Tools Used**: {len(tools_used)}
 
 ## Patterns Discovered
 
 ### Tool Usage Patterns
-"""
+"""]
         
         for pattern, count in patterns['tool_patterns'].items():
-            content += f"- `{pattern}`: {count} occurrences\n"
+            parts.append(f"- `{pattern}`: {count} occurrences\n")
         
-        content += f"""
+        parts.append(f"""
 ### Error Resolution Patterns
 **Errors Encountered**: {len(errors['errors'])}
 **Errors Resolved**: {errors['resolved']}
 **Success Rate**: {errors['success_rate']:.1%}
 
 ### Common Error Types
-"""
+""")
         
         for error_type, count in errors['error_types'].items():
-            content += f"- {error_type}: {count} occurrences\n"
+            parts.append(f"- {error_type}: {count} occurrences\n")
         
-        content += f"""
+        parts.append(f"""
 ## Learning Outcomes
 
 ### New Capabilities Demonstrated
-"""
+""")
         
         # Identify new capabilities
-        capabilities = self.identify_capabilities(tools_used)
+        capabilities = self.identify_capabilities(scan)
         for cap in capabilities:
-            content += f"- {cap}\n"
+            parts.append(f"- {cap}\n")
         
-        content += f"""
+        parts.append(f"""
 ## Efficiency Metrics
 
 - **Average Tool Execution**: {self.calculate_avg_execution(tools_used):.2f}s
@@ -488,41 +497,68 @@ For more details, check the individual files or the session logs.
 ## Recommendations
 
 ### Patterns to Remember
-"""
+""")
         
-        for pattern in patterns.get('valuable_patterns', [])[:5]:
-            content += f"- {pattern}\n"
+        for pattern in islice(patterns.get('valuable_patterns', []), 5):
+            parts.append(f"- {pattern}\n")
         
-        content += """
+        parts.append("""
 ### Areas for Improvement
-"""
+""")
         
-        for improvement in self.suggest_improvements(tools_used, errors):
-            content += f"- {improvement}\n"
+        for improvement in self.suggest_improvements(scan, errors):
+            parts.append(f"- {improvement}\n")
         
-        content += """
+        parts.append("""
 ---
 *This report was auto-generated by Betty's Learning System*
-"""
+""")
         
-        with open(report_path, 'w') as f:
-            f.write(content)
+        report_path.write_text(''.join(parts), encoding='utf-8')
         
         return report_path
     
-    def analyze_patterns(self, tools_used):
+    def scan_tools(self, tools_used):
+        """Walk the session's tools once, collecting everything the learning report needs"""
+        scan = ToolScan(tool_count=len(tools_used))
+        names = []
+        
+        for i, tool in enumerate(tools_used):
+            name = tool.get('name')
+            params = tool.get('params', {})
+            names.append(name)
+            scan.tool_names.add(name)
+            scan.lowered.append(str(tool).lower())
+            
+            # Tool-to-tool transitions (the session's final pair is not counted)
+            if 1 <= i < len(tools_used) - 1:
+                sequence = f"{names[i-1]}→{name}"
+                scan.tool_patterns[sequence] += 1
+            
+            # Read-edit-test cycle
+            if i >= 2 and names[i-2] == 'Read' and names[i-1] in ['Edit', 'MultiEdit'] and name == 'Bash':
+                scan.debug_cycle = True
+            
+            if name == 'Bash':
+                cmd = params.get('command', '')
+                if 'test' in cmd or 'jest' in cmd or 'pytest' in cmd:
+                    scan.ran_tests = True
+            elif name in ['Edit', 'MultiEdit']:
+                # Repeated edits to the same file
+                file_path = params.get('file_path')
+                if file_path:
+                    scan.file_edits[file_path] += 1
+        
+        return scan
+    
+    def analyze_patterns(self, scan):
         """Analyze patterns in tool usage"""
         patterns = {
-            'tool_patterns': {},
+            'tool_patterns': scan.tool_patterns,
             'valuable_patterns': [],
             'reuse_count': 0
         }
         
-        # Find repeated sequences
-        for i in range(len(tools_used) - 2):
-            sequence = f"{tools_used[i].get('name')}→{tools_used[i+1].get('name')}"
-            patterns['tool_patterns'][sequence] = patterns['tool_patterns'].get(sequence, 0) + 1
-        
         # Identify valuable patterns (used 3+ times)
         patterns['valuable_patterns'] = [
             p for p, count in patterns['tool_patterns'].items() 
@@ -536,24 +572,27 @@ For more details, check the individual files or the session logs.
         
         return patterns
     
-    def analyze_errors(self, tools_used):
+    def analyze_errors(self, scan):
         """Analyze error patterns"""
         errors = {
             'errors': [],
             'resolved': 0,
-            'error_types': {},
+            'error_types': defaultdict(int),
             'success_rate': 0,
             'avg_recovery_time': 0
         }
         
-        for i, tool in enumerate(tools_used):
-            if 'error' in str(tool).lower():
-                error_type = self.classify_error(tool)
-                errors['error_types'][error_type] = errors['error_types'].get(error_type, 0) + 1
+        # Each tool was stringified once by scan_tools; the resolution window revisits up to 10
+        lowered = scan.lowered
+        
+        for i, tool_str in enumerate(lowered):
+            if 'error' in tool_str:
+                error_type = self.classify_error(tool_str)
+                errors['error_types'][error_type] += 1
                 errors['errors'].append((i, error_type))
                 
                 # Check if resolved
-                if self.was_resolved(tools_used[i:min(i+10, len(tools_used))]):
+                if self.was_resolved(lowered[i:i+10]):
                     errors['resolved'] += 1
         
         if errors['errors']:
@@ -561,35 +600,25 @@ For more details, check the individual files or the session logs.
         
         return errors
     
-    def classify_error(self, tool):
-        """Classify error type"""
-        error_str = str(tool).lower()
-        
-        if 'permission' in error_str:
-            return 'Permission Error'
-        elif 'not found' in error_str:
-            return 'Not Found Error'
-        elif 'syntax' in error_str:
-            return 'Syntax Error'
-        elif 'connection' in error_str:
-            return 'Connection Error'
-        elif 'timeout' in error_str:
-            return 'Timeout Error'
-        else:
-            return 'Other Error'
+    def classify_error(self, error_str):
+        """Classify error type from a lowered tool record"""
+        for needle, error_type in ERROR_TYPES:
+            if needle in error_str:
+                return error_type
+        return 'Other Error'
     
     def was_resolved(self, subsequent_tools):
-        """Check if error was resolved in subsequent tools"""
-        for tool in subsequent_tools:
-            if 'success' in str(tool).lower() or 'complete' in str(tool).lower():
+        """Check if error was resolved in subsequent (lowered) tool records"""
+        for tool_str in subsequent_tools:
+            if 'success' in tool_str or 'complete' in tool_str:
                 return True
         return False
     
-    def identify_capabilities(self, tools_used):
+    def identify_capabilities(self, scan):
         """Identify demonstrated capabilities"""
         capabilities = set()
         
-        tool_names = [t.get('name') for t in tools_used]
+        tool_names = scan.tool_names
         
         if 'Write' in tool_names:
             capabilities.add('File creation')
@@ -601,65 +630,43 @@ For more details, check the individual files or the session logs.
             capabilities.add('Command execution')
         
         # Check for specific patterns
-        if self.has_test_pattern(tools_used):
+        if scan.ran_tests:
             capabilities.add('Test-driven development')
-        if self.has_debug_pattern(tools_used):
+        if scan.debug_cycle:
             capabilities.add('Debugging and error resolution')
         
         return list(capabilities)
     
-    def has_test_pattern(self, tools_used):
-        """Check if testing pattern was used"""
-        for tool in tools_used:
-            if tool.get('name') == 'Bash':
-                cmd = tool.get('params', {}).get('command', '')
-                if 'test' in cmd or 'jest' in cmd or 'pytest' in cmd:
-                    return True
-        return False
-    
-    def has_debug_pattern(self, tools_used):
-        """Check if debugging pattern was used"""
-        # Look for read-edit-test cycle
-        for i in range(len(tools_used) - 2):
-            if (tools_used[i].get('name') == 'Read' and 
-                tools_used[i+1].get('name') in ['Edit', 'MultiEdit'] and
-                tools_used[i+2].get('name') == 'Bash'):
-                return True
-        return False
-    
     def calculate_avg_execution(self, tools_used):
         """Calculate average tool execution time"""
         # Simplified - would need actual timing data
         return len(tools_used) * 0.5  # Assume 0.5s per tool
     
-    def suggest_improvements(self, tools_used, errors):
+    def suggest_improvements(self, scan, errors):
         """Suggest improvements based on session"""
         suggestions = []
         
         if errors['errors'] and errors['success_rate'] < 0.5:
             suggestions.append("Low error resolution rate - consider better error handling")
         
-        if len(tools_used) > 50:
+        if scan.tool_count > 50:
             suggestions.append("Long session - consider breaking into smaller tasks")
         
         # Check for repeated edits to same file
-        file_edits = {}
-        for tool in tools_used:
-            if tool.get('name') in ['Edit', 'MultiEdit']:
-                file_path = tool.get('params', {}).get('file_path')
-                if file_path:
-                    file_edits[file_path] = file_edits.get(file_path, 0) + 1
-        
-        for file_path, count in file_edits.items():
+        for file_path, count in scan.file_edits.items():
             if count > 5:
                 suggestions.append(f"File '{Path(file_path).name}' edited {count} times - consider refactoring")
         
         return suggestions[:5]  # Limit to 5 suggestions
     
     def notify_documentation_created(self, doc_path, changes):
-        """Send notification about created documentation"""
+        """Send a notification about created documentation from a detached child"""
+        if NTFY_DISABLED:
+            return
+        
         try:
-            import requests
+            # Imported here so sessions that generate no docs never load it
+            import betty_ntfy
             
             feature_type = "API" if changes['api_endpoints'] else "Feature"
             files_changed = len(changes['files_created']) + len(changes['files_modified'])
@@ -669,17 +676,13 @@ For more details, check the individual files or the session logs.
             message += f"Lines added: {changes['total_lines_added']}\n"
             message += f"Location: {doc_path.name}"
             
-            requests.post(
-                'https://ntfy.da-tech.io/Betty',
-                data=message.encode('utf-8'),
-                headers={
-                    'Title': f'Documentation: New {feature_type}',
-                    'Priority': 'low',
-                    'Tags': 'docs,feature'
-                },
-                timeout=2
+            betty_ntfy.post_detached(
+                f'Documentation: New {feature_type}',
+                message,
+                priority='low',
+                tags=['docs', 'feature']
             )
-        except:
+        except Exception:
             pass
 
 if __name__ == '__main__':
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+ABOUTME: Betty Auto Test & Fix Client - Forwards hook data to a running auto-test-fix daemon
+ABOUTME: Falls back to running auto-test-fix.py directly when no daemon is listening
+"""
+
+import json
+import sys
+import socket
+import subprocess
+from pathlib import Path
+
+# Must match BettyAutoTestFix.socket_path
+SOCKET_PATH = '/home/jarvis/projects/Betty/test-results/.auto-test-fix.sock'
+HOOK_SCRIPT = Path(__file__).resolve().parent / 'auto-test-fix.py'
+
+# A listening daemon accepts at once; its reply waits on the full test and fix run
+CONNECT_TIMEOUT = 1
+REPLY_TIMEOUT = 600
+
+def connect_to_daemon():
+    """Socket connected to the daemon, or None if it isn't running"""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(CONNECT_TIMEOUT)
+    try:
+        sock.connect(SOCKET_PATH)
+    except OSError:
+        sock.close()
+        return None
+    sock.settimeout(REPLY_TIMEOUT)
+    return sock
+
+def forward_to_daemon(sock, payload):
+    """Send hook data to the daemon and return its reply"""
+    with sock:
+        # The daemon reads one line per request; raw newlines in JSON are only whitespace
+        sock.sendall(payload.replace(b'\n', b' ') + b'\n')
+        with sock.makefile('rb') as reader:
+            reply = reader.readline()
+    return json.loads(reply)
+
+def main():
+    payload = sys.stdin.buffer.read()
+    
+    sock = connect_to_daemon()
+    if sock is None:
+        # No daemon - run the hook one-shot
+        return subprocess.run([sys.executable, str(HOOK_SCRIPT)], input=payload).returncode
+    
+    try:
+        reply = forward_to_daemon(sock, payload)
+    except (OSError, ValueError) as e:
+        # The daemon may already have run tests and fixers on this tree, so don't run them again
+        print(f"Auto test & fix daemon failed mid-request: {e}", file=sys.stderr)
+        return 1
+    
+    sys.stderr.write(reply.get('stderr', ''))
+    return reply.get('exit_code', 0)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+ABOUTME: Shared JSON, atomic-write and log-file helpers for Betty hooks
+ABOUTME: Used by pre-tool-guardian.py, user-prompt-analyzer.py, ntfy-notifier.py, session-outcome-analyzer.py,
+ABOUTME: auto-documentation-generator.py, auto-test-fix.py, learning-reporter.py and smart-completion-guardian.py
+"""
+
+import atexit
+import json
+import os
+from functools import lru_cache
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def load_json_bytes(data):
+    """Parse JSON bytes, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def dump_json_bytes(data, indent=False):
+    """Serialize to UTF-8 JSON (compact, or 2-space indented), using orjson when it is installed"""
+    # Non-string keys and values JSON has no type for (datetimes, paths) are written as str
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(data, option=option, default=str)
+    if indent:
+        return json.dumps(data, indent=2, default=str).encode('utf-8')
+    return json.dumps(data, separators=(',', ':'), default=str).encode('utf-8')
+
+def dump_json_line(data):
+    """Serialize to one compact newline-terminated UTF-8 JSON line"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_APPEND_NEWLINE)
+    return json.dumps(data, separators=(',', ':')).encode('utf-8') + b'\n'
+
+def atomic_write_bytes(path, data):
+    """Write a file via a temp sibling and os.replace so readers never see a partial file"""
+    tmp_path = path.with_suffix(path.suffix + '.tmp')
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+@lru_cache(maxsize=32)
+def ensure_dir(path):
+    """Create a directory tree, probing each path at most once per process"""
+    os.makedirs(path, exist_ok=True)
+
+# Log files stay open for the life of the process and are flushed once at exit
+LOG_BUFFER_SIZE = 64 * 1024
+LOG_HANDLES = {}
+
+def get_log(path):
+    """Buffered append handle for a log file, opened at most once per process"""
+    handle = LOG_HANDLES.get(path)
+    if handle is None:
+        ensure_dir(os.path.dirname(path))
+        handle = open(path, 'ab', buffering=LOG_BUFFER_SIZE)
+        LOG_HANDLES[path] = handle
+    return handle
+
+def close_logs():
+    """Flush and close every log handle"""
+    for handle in LOG_HANDLES.values():
+        handle.close()
+
+atexit.register(close_logs)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+ABOUTME: Shared NTFY client for Betty hooks - each post goes out from its own detached child
+ABOUTME: Used by ntfy-notifier.py, session-outcome-analyzer.py, auto-documentation-generator.py,
+ABOUTME: pre-tool-guardian.py, user-prompt-analyzer.py, auto-test-fix.py and learning-reporter.py;
+ABOUTME: post_detached sends without holding up the hook
+"""
+
+import os
+import sys
+import time
+
+# NTFY Configuration - Andre's personal server
+NTFY_URL = "https://ntfy.da-tech.io"
+NTFY_TOPIC = os.environ.get('BETTY_NTFY_TOPIC', 'Betty')  # Andre's Betty topic
+NTFY_ENDPOINT = f"{NTFY_URL}/{NTFY_TOPIC}"
+# (connect, read) seconds; posts run in a detached child, so nothing waits on them
+NTFY_TIMEOUT = (2, 5)
+
+# Notifications that didn't go out leave a one-line breadcrumb here
+FAILURE_LOG = '/home/jarvis/projects/Betty/logs/ntfy-failures.log'
+
+def post(title, message, priority='default', tags=None, headers=None):
+    """Send one notification to NTFY, returning True when it was accepted"""
+    # Imported here, so a hook that hands its post to a detached child never loads requests.
+    # Each child makes a single post, so there is no connection to keep alive between posts
+    import requests
+    
+    # NTFY expects ASCII in headers, move emojis to message
+    if any(ord(c) > 127 for c in title):
+        message = f"{title}\n\n{message}"
+        title = ' '.join(title.encode('ascii', 'ignore').decode('ascii').split()) or 'Betty Notification'
+    
+    request_headers = {
+        'Title': title,
+        'Priority': priority,
+    }
+    if tags:
+        request_headers['Tags'] = ','.join(tags)
+    if headers:
+        request_headers.update(headers)
+    
+    try:
+        response = requests.post(
+            NTFY_ENDPOINT,
+            data=message.encode('utf-8'),
+            headers=request_headers,
+            timeout=NTFY_TIMEOUT
+        )
+    except Exception as e:
+        record_failure(title, str(e))
+        return False
+    
+    if response.status_code != 200:
+        record_failure(title, f"HTTP {response.status_code}")
+        return False
+    return True
+
+def post_detached(title, message, priority='default', tags=None, headers=None):
+    """Send a notification from a detached child; the hook returns and exits without waiting"""
+    run_detached(post, title, message, priority, tags, headers)
+
+def run_detached(func, *args):
+    """Run func in a double-forked child detached from the hook's stdio; run inline if fork is unavailable"""
+    sys.stdout.flush()
+    sys.stderr.flush()
+    try:
+        pid = os.fork()
+    except (AttributeError, OSError):
+        func(*args)
+        return
+    
+    if pid:
+        # The intermediate child exits straight away; reap it so a long-lived caller
+        # (the auto-test-fix daemon) doesn't collect zombies
+        os.waitpid(pid, 0)
+        return
+    
+    try:
+        os.setsid()
+        if os.fork() == 0:
+            devnull = os.open(os.devnull, os.O_RDWR)
+            for fd in (0, 1, 2):
+                os.dup2(devnull, fd)
+            func(*args)
+    finally:
+        # Never fall back into the caller's code or its atexit handlers
+        os._exit(0)
+
+def record_failure(title, reason):
+    """Append a breadcrumb for a notification that didn't go out"""
+    try:
+        os.makedirs(os.path.dirname(FAILURE_LOG), exist_ok=True)
+        with open(FAILURE_LOG, 'a') as f:
+            f.write(f"{time.strftime('%Y-%m-%dT%H:%M:%S')} {title!r}: {reason}\n")
+    except OSError:
+        pass
@@ -5,26 +5,231 @@ ABOUTME: Tracks patterns, errors resolved, knowledge gained, and system evolutio
 """
 
 import json
+import atexit
+import bisect
+import heapq
 import sys
-import os
 from datetime import datetime, timedelta
 from pathlib import Path
-import hashlib
-from collections import defaultdict
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
+from operator import itemgetter
+
+import betty_ntfy
+from betty_io import atomic_write_bytes, dump_json_bytes, load_json_bytes
+
+HALL_OF_FAME_SIZE = 20
+MAX_METRIC_WORKERS = 8
+
+def date_to_int(day):
+    """Pack a date as a YYYYMMDD integer so range checks are plain int compares"""
+    return day.year * 10000 + day.month * 100 + day.day
+
+def iso_date_to_int(timestamp):
+    """Pack the date part of an ISO timestamp as YYYYMMDD without building a datetime"""
+    if not isinstance(timestamp, str) or len(timestamp) < 10 or timestamp[4] != '-' or timestamp[7] != '-':
+        return None
+    try:
+        return int(timestamp[0:4] + timestamp[5:7] + timestamp[8:10])
+    except ValueError:
+        return None
+
+class BatchingWriter:
+    """Buffers JSONL lines per file and appends each file's batch in a single write"""
+    
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.pending = defaultdict(list)
+        self.buffered = 0
+        atexit.register(self.flush)
+    
+    def append(self, path, line):
+        """Queue one encoded line, flushing once the batch is full"""
+        self.pending[path].append(line)
+        self.buffered += 1
+        if self.buffered >= self.batch_size:
+            self.flush()
+    
+    def flush(self):
+        """Append all queued lines, one open/write per file"""
+        for path, lines in self.pending.items():
+            try:
+                with open(path, 'ab') as f:
+                    f.write(b'\n'.join(lines) + b'\n')
+            except OSError as e:
+                print(f"Learning reporter error: could not write {path}: {e}", file=sys.stderr)
+        self.pending.clear()
+        self.buffered = 0
 
 class BettyLearningReporter:
     def __init__(self):
         self.betty_dir = Path('/home/jarvis/projects/Betty')
         self.reports_dir = self.betty_dir / 'reports' / 'learning'
         self.patterns_db = self.betty_dir / 'patterns' / 'discovered.json'
+        self.pattern_count_file = self.betty_dir / 'patterns' / 'discovered.count'
+        self.summary_file = self.betty_dir / 'patterns' / 'summary.json'
         self.metrics_db = self.betty_dir / 'metrics' / 'learning.json'
+        self.state_file = self.betty_dir / 'state' / 'reporter.json'
         
         # Create directories
         self.reports_dir.mkdir(parents=True, exist_ok=True)
         
-        # Load historical data
-        self.historical_patterns = self.load_historical_patterns()
+        # Session events are batched and flushed at exit (or every 1000 events)
+        self.session_log = BatchingWriter()
+        
+        # Load historical data (patterns are loaded lazily, see historical_patterns)
         self.learning_metrics = self.load_learning_metrics()
+    
+    @cached_property
+    def historical_patterns(self):
+        """Full pattern history, only parsed when a report actually needs it"""
+        return self.load_historical_patterns()
+    
+    @cached_property
+    def pattern_timeline(self):
+        """Dated patterns sorted by YYYYMMDD, with a parallel key list for bisect"""
+        dated = []
+        for pattern in self.historical_patterns:
+            if not isinstance(pattern, dict):
+                continue
+            ts_int = iso_date_to_int(pattern.get('timestamp'))
+            if ts_int is None:
+                continue
+            pattern['ts_int'] = ts_int
+            dated.append(pattern)
+        
+        dated.sort(key=lambda pattern: pattern['ts_int'])
+        return [pattern['ts_int'] for pattern in dated], dated
+    
+    def period_bounds(self, start_date, end_date):
+        """Index range of patterns learned between start_date and end_date inclusive"""
+        keys, _ = self.pattern_timeline
+        return (bisect.bisect_left(keys, date_to_int(start_date)),
+                bisect.bisect_right(keys, date_to_int(end_date)))
+    
+    def patterns_in_period(self, start_date, end_date):
+        """Patterns learned between start_date and end_date inclusive"""
+        lo, hi = self.period_bounds(start_date, end_date)
+        return self.pattern_timeline[1][lo:hi]
+    
+    @cached_property
+    def summary(self):
+        """Running aggregates over discovered.json, folded forward over appended patterns, rebuilt after edits"""
+        try:
+            summary = load_json_bytes(self.summary_file.read_bytes())
+        except (OSError, ValueError):
+            summary = None
+        if not isinstance(summary, dict) or 'top_patterns' not in summary:
+            summary = self.new_summary()
+        
+        # Database untouched since the last fold - no need to parse it at all
+        source = self.patterns_db_identity()
+        if summary.get('source') == source:
+            return summary
+        
+        patterns = self.historical_patterns
+        if not isinstance(patterns, list):
+            # Only a list of patterns can be folded; anything else (e.g. a dict) contributes
+            # nothing, but is recorded as seen so it isn't rescanned on every run
+            summary = self.new_summary()
+            summary['patterns_seen'] = self.pattern_count()
+        else:
+            if summary['patterns_seen'] >= len(patterns):
+                # Changed without growing, so entries were edited or removed rather than
+                # appended; start over
+                summary = self.new_summary()
+            
+            for index, pattern in enumerate(patterns[summary['patterns_seen']:], summary['patterns_seen']):
+                self.fold_into_summary(summary, pattern, index)
+            summary['patterns_seen'] = len(patterns)
+        summary['source'] = source
+        
+        try:
+            atomic_write_bytes(self.summary_file, dump_json_bytes(summary))
+        except OSError:
+            pass
+        return summary
+    
+    def new_summary(self):
+        """Empty running-aggregate document"""
+        return {
+            'source': None,  # [st_mtime_ns, st_size] of discovered.json when last folded
+            'patterns_seen': 0,
+            'category_counts': {},
+            'successes': 0,
+            'failures': 0,
+            'total_time_saved': 0.0,
+            'resolution_time_total': 0.0,
+            'resolution_count': 0,
+            'top_patterns': [],  # min-heap of [value_score, index, entry]
+        }
+    
+    def fold_into_summary(self, summary, pattern, index):
+        """Add one pattern's contribution to the running aggregates"""
+        if not isinstance(pattern, dict):
+            return
+        
+        category = pattern.get('category')
+        if category:
+            summary['category_counts'][category] = summary['category_counts'].get(category, 0) + 1
+        
+        if 'success' in pattern:
+            summary['successes' if pattern['success'] else 'failures'] += 1
+        
+        time_saved = pattern.get('time_saved')
+        if isinstance(time_saved, (int, float)):
+            summary['total_time_saved'] += time_saved
+        
+        resolution_time = pattern.get('resolution_time')
+        if isinstance(resolution_time, (int, float)):
+            summary['resolution_time_total'] += resolution_time
+            summary['resolution_count'] += 1
+        
+        value_score = pattern.get('value_score')
+        if isinstance(value_score, (int, float)):
+            # The index breaks score ties so the heap never compares entries
+            entry = [value_score, index, {
+                'name': pattern.get('name', 'unnamed'),
+                'value_score': value_score,
+                'usage_count': pattern.get('usage_count', 0),
+                'time_saved': time_saved if isinstance(time_saved, (int, float)) else 0,
+            }]
+            top = summary['top_patterns']
+            if len(top) < HALL_OF_FAME_SIZE:
+                heapq.heappush(top, entry)
+            elif entry > top[0]:
+                heapq.heapreplace(top, entry)
+    
+    def patterns_db_identity(self):
+        """[st_mtime_ns, st_size] of discovered.json, or None when it doesn't exist"""
+        try:
+            stat = self.patterns_db.stat()
+        except FileNotFoundError:
+            return None
+        return [stat.st_mtime_ns, stat.st_size]
+    
+    def pattern_count(self):
+        """Number of discovered patterns, read from the discovered.count sidecar when current"""
+        try:
+            patterns_mtime = self.patterns_db.stat().st_mtime_ns
+        except FileNotFoundError:
+            return 0
+        
+        try:
+            if self.pattern_count_file.stat().st_mtime_ns >= patterns_mtime:
+                return int(self.pattern_count_file.read_text())
+        except (OSError, ValueError):
+            pass
+        
+        # Sidecar missing or older than the database - count once and refresh it
+        patterns = self.historical_patterns
+        count = len(patterns) if isinstance(patterns, (list, dict)) else 0
+        try:
+            atomic_write_bytes(self.pattern_count_file, str(count).encode('ascii'))
+        except OSError:
+            pass
+        return count
         
     def generate_report(self):
         """Generate comprehensive learning report"""
@@ -40,10 +245,18 @@ class BettyLearningReporter:
                 report = self.generate_milestone_report()
             else:
                 report = self.generate_session_report()
+                
+                # No hook data on stdin - nothing to report
+                if report is None:
+                    return 0
             
             # Save report
             report_path = self.save_report(report, report_type)
             
+            # Scheduled reports only count as done once they are on disk
+            if report_type != 'session':
+                self.record_report_run(report_type)
+            
             print(f"📊 Betty: Generated {report_type} learning report at {report_path}", file=sys.stderr)
             
             # Send notification for significant reports
@@ -58,23 +271,57 @@ class BettyLearningReporter:
     def determine_report_type(self):
         """Determine what type of report to generate"""
         
-        # Check if it's time for scheduled reports
+        # Scheduled reports are due relative to when they last ran, not to a wall-clock window
         now = datetime.now()
+        state = self.reporter_state = self.load_reporter_state()
+        report_type = 'session'
         
-        # Daily report at midnight
-        if now.hour == 0 and now.minute < 5:
-            return 'daily'
+        last_daily = self.parse_state_time(state.get('last_daily'))
+        last_weekly = self.parse_state_time(state.get('last_weekly'))
         
-        # Weekly report on Sundays
-        if now.weekday() == 6 and now.hour == 0:
-            return 'weekly'
+        # Daily report once per calendar day
+        if last_daily is None or last_daily.date() < now.date():
+            report_type = 'daily'
         
-        # Milestone report (every 100 patterns learned)
-        if len(self.historical_patterns) % 100 == 0 and len(self.historical_patterns) > 0:
-            return 'milestone'
+        # Weekly report once every 7 days
+        elif last_weekly is None or (now - last_weekly).days >= 7:
+            report_type = 'weekly'
         
-        # Default to session report
-        return 'session'
+        else:
+            # Milestone report (every 100 patterns learned)
+            pattern_count = self.pattern_count()
+            if pattern_count > 0 and pattern_count // 100 > state.get('last_milestone', 0) // 100:
+                report_type = 'milestone'
+                state['last_milestone'] = pattern_count
+        
+        return report_type
+    
+    def record_report_run(self, report_type):
+        """Mark a scheduled report as done, so a report that failed is retried on the next hook"""
+        state = self.reporter_state
+        if report_type in ('daily', 'weekly'):
+            state[f'last_{report_type}'] = datetime.now().isoformat()
+        self.save_reporter_state(state)
+    
+    def load_reporter_state(self):
+        """Load when each scheduled report last ran"""
+        try:
+            state = load_json_bytes(self.state_file.read_bytes())
+            return state if isinstance(state, dict) else {}
+        except (OSError, ValueError):
+            return {}
+    
+    def save_reporter_state(self, state):
+        """Persist scheduled report state atomically"""
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write_bytes(self.state_file, dump_json_bytes(state))
+    
+    def parse_state_time(self, value):
+        """Parse an ISO timestamp from the state file, or None if missing/invalid"""
+        try:
+            return datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            return None
     
     def generate_daily_report(self):
         """Generate daily learning summary"""
@@ -115,19 +362,31 @@ class BettyLearningReporter:
         end_date = datetime.now().date()
         start_date = end_date - timedelta(days=7)
         
+        # Build the shared index up front so the workers don't race to parse discovered.json
+        self.pattern_timeline
+        
+        # The metric queries are independent, so run them concurrently.
+        # Computed once; the executive summary reuses the same figures
+        metric_calls = {
+            'total_patterns_learned': self.count_patterns_in_period,
+            'total_errors_resolved': self.count_errors_resolved_in_period,
+            'unique_error_types': self.count_unique_error_types,
+            'features_completed': self.count_features_in_period,
+            'knowledge_reuse_rate': self.calculate_reuse_rate,
+            'automation_opportunities': self.identify_automation_opportunities,
+        }
+        with ThreadPoolExecutor(max_workers=MAX_METRIC_WORKERS) as executor:
+            futures = {key: executor.submit(call, start_date, end_date) for key, call in metric_calls.items()}
+            time_saved_future = executor.submit(self.calculate_time_saved, start_date, end_date)
+            metrics = {key: future.result() for key, future in futures.items()}
+            time_saved = time_saved_future.result()
+        
         report = {
             'type': 'weekly',
             'week_ending': end_date.isoformat(),
             'period': f"{start_date.isoformat()} to {end_date.isoformat()}",
-            'executive_summary': self.generate_executive_summary(start_date, end_date),
-            'metrics': {
-                'total_patterns_learned': self.count_patterns_in_period(start_date, end_date),
-                'total_errors_resolved': self.count_errors_resolved_in_period(start_date, end_date),
-                'unique_error_types': self.count_unique_error_types(start_date, end_date),
-                'features_completed': self.count_features_in_period(start_date, end_date),
-                'knowledge_reuse_rate': self.calculate_reuse_rate(start_date, end_date),
-                'automation_opportunities': self.identify_automation_opportunities(start_date, end_date),
-            },
+            'executive_summary': self.generate_executive_summary(metrics, time_saved),
+            'metrics': metrics,
             'pattern_analysis': {
                 'top_patterns': self.get_top_patterns_for_period(start_date, end_date, limit=10),
                 'emerging_patterns': self.identify_emerging_patterns(start_date, end_date),
@@ -140,7 +399,7 @@ class BettyLearningReporter:
                 'prevention_opportunities': self.identify_prevention_opportunities(start_date, end_date),
             },
             'efficiency_trends': {
-                'time_saved': self.calculate_time_saved(start_date, end_date),
+                'time_saved': time_saved,
                 'error_reduction': self.calculate_error_reduction(start_date, end_date),
                 'pattern_efficiency': self.analyze_pattern_efficiency(start_date, end_date),
             },
@@ -152,7 +411,7 @@ class BettyLearningReporter:
     def generate_milestone_report(self):
         """Generate milestone achievement report"""
         
-        total_patterns = len(self.historical_patterns)
+        total_patterns = self.pattern_count()
         milestone_number = total_patterns // 100
         
         report = {
@@ -177,7 +436,7 @@ class BettyLearningReporter:
                 'productivity_gain': self.calculate_productivity_gain(),
                 'knowledge_value': self.estimate_knowledge_value(),
             },
-            'pattern_hall_of_fame': self.get_most_valuable_patterns(limit=20),
+            'pattern_hall_of_fame': self.get_most_valuable_patterns(),
             'future_predictions': self.predict_future_learning(),
         }
         
@@ -187,9 +446,18 @@ class BettyLearningReporter:
         """Generate report for current session"""
         
         # Get session data from stdin if available
+        if sys.stdin is None or sys.stdin.isatty():
+            return None
+        
+        raw = sys.stdin.read()
+        if not raw.strip():
+            return None
+        
         try:
-            hook_data = json.load(sys.stdin)
-        except:
+            hook_data = json.loads(raw)
+        except ValueError:
+            hook_data = {}
+        if not isinstance(hook_data, dict):
             hook_data = {}
         
         session_patterns = self.extract_session_patterns(hook_data)
@@ -206,16 +474,15 @@ class BettyLearningReporter:
         
         return report
     
-    def generate_executive_summary(self, start_date, end_date):
-        """Generate executive summary for period"""
+    def generate_executive_summary(self, metrics, time_saved):
+        """Generate executive summary from the period's already computed metrics"""
         
-        patterns = self.count_patterns_in_period(start_date, end_date)
-        errors = self.count_errors_resolved_in_period(start_date, end_date)
-        time_saved = self.calculate_time_saved(start_date, end_date)
+        patterns = metrics['total_patterns_learned']
+        errors = metrics['total_errors_resolved']
         
         summary = f"""Betty learned {patterns} new patterns and resolved {errors} errors this week, 
         saving approximately {time_saved:.1f} hours of development time. 
-        Knowledge reuse increased by {self.calculate_reuse_rate(start_date, end_date):.1%}, 
+        Knowledge reuse increased by {metrics['knowledge_reuse_rate']:.1%}, 
         demonstrating improved efficiency in problem-solving."""
         
         return summary
@@ -223,20 +490,28 @@ class BettyLearningReporter:
     def save_report(self, report, report_type):
         """Save report to file"""
         
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        now = datetime.now()
+        date_stamp = f"{now.year:04d}{now.month:02d}{now.day:02d}"
+        
+        # Session reports fire on every hook, so they share one append-only log per day;
+        # a lost tail line on crash is acceptable, so no fsync
+        if report_type == 'session':
+            log_path = self.reports_dir / f"sessions_{date_stamp}.jsonl"
+            self.session_log.append(log_path, dump_json_bytes(report))
+            return log_path
+        
+        timestamp = f"{date_stamp}_{now.hour:02d}{now.minute:02d}{now.second:02d}"
         filename = f"{report_type}_report_{timestamp}.json"
         report_path = self.reports_dir / filename
         
-        with open(report_path, 'w') as f:
-            json.dump(report, f, indent=2, default=str)
+        atomic_write_bytes(report_path, dump_json_bytes(report))
         
         # Also generate markdown version for readability
         md_filename = f"{report_type}_report_{timestamp}.md"
         md_path = self.reports_dir / md_filename
         
         md_content = self.format_report_as_markdown(report)
-        with open(md_path, 'w') as f:
-            f.write(md_content)
+        atomic_write_bytes(md_path, md_content.encode('utf-8'))
         
         return md_path
     
@@ -257,7 +532,7 @@ class BettyLearningReporter:
     def format_daily_report_markdown(self, report):
         """Format daily report as markdown"""
         
-        md = f"""# Betty Daily Learning Report
+        parts = [f"""# Betty Daily Learning Report
 **Date**: {report['date']}
 
 ## Summary
@@ -270,33 +545,30 @@ class BettyLearningReporter:
 ## Pattern Analysis
 
 ### New Patterns Today
-"""
+"""]
         
-        for pattern in report['patterns']['new'][:5]:
-            md += f"- `{pattern}`\n"
+        parts.extend(f"- `{pattern}`\n" for pattern in report['patterns']['new'][:5])
         
-        md += f"""
+        parts.append(f"""
 ### Most Used Patterns
-"""
-        for pattern, count in report['patterns']['most_used']:
-            md += f"- `{pattern}`: {count} uses\n"
+""")
+        parts.extend(f"- `{pattern}`: {count} uses\n" for pattern, count in report['patterns']['most_used'])
         
-        md += f"""
+        parts.append(f"""
 ## Learning Velocity
 - **Current Rate**: {report['learning_velocity']} patterns/day
 - **Knowledge Growth**: {report['knowledge_growth']:.1%}
 
 ## Recommendations
-"""
-        for rec in report['recommendations']:
-            md += f"- {rec}\n"
+""")
+        parts.extend(f"- {rec}\n" for rec in report['recommendations'])
         
-        return md
+        return "".join(parts)
     
     def format_weekly_report_markdown(self, report):
         """Format weekly report as markdown"""
         
-        md = f"""# Betty Weekly Learning Report
+        parts = [f"""# Betty Weekly Learning Report
 **Week Ending**: {report['week_ending']}
 **Period**: {report['period']}
 
@@ -314,41 +586,37 @@ class BettyLearningReporter:
 ## Pattern Analysis
 
 ### Top Patterns This Week
-"""
+"""]
         
-        for pattern in report['pattern_analysis']['top_patterns'][:5]:
-            md += f"- `{pattern['name']}`: {pattern['usage_count']} uses, {pattern['success_rate']:.1%} success\n"
+        parts.extend(f"- `{pattern['name']}`: {pattern['usage_count']} uses, {pattern['success_rate']:.1%} success\n" for pattern in report['pattern_analysis']['top_patterns'][:5])
         
-        md += f"""
+        parts.append(f"""
 ### Emerging Patterns
-"""
-        for pattern in report['pattern_analysis']['emerging_patterns']:
-            md += f"- `{pattern}`\n"
+""")
+        parts.extend(f"- `{pattern}`\n" for pattern in report['pattern_analysis']['emerging_patterns'])
         
-        md += f"""
+        parts.append(f"""
 ## Error Intelligence
 
 ### Common Errors
-"""
-        for error, count in report['error_intelligence']['common_errors'][:5]:
-            md += f"- {error}: {count} occurrences\n"
+""")
+        parts.extend(f"- {error}: {count} occurrences\n" for error, count in report['error_intelligence']['common_errors'][:5])
         
-        md += f"""
+        parts.append(f"""
 ## Efficiency Gains
 - **Time Saved**: {report['efficiency_trends']['time_saved']:.1f} hours
 - **Error Reduction**: {report['efficiency_trends']['error_reduction']:.1%}
 
 ## Recommendations
-"""
-        for rec in report['recommendations']:
-            md += f"- {rec}\n"
+""")
+        parts.extend(f"- {rec}\n" for rec in report['recommendations'])
         
-        return md
+        return "".join(parts)
     
     def format_milestone_report_markdown(self, report):
         """Format milestone report as markdown"""
         
-        md = f"""# 🎉 Betty Milestone Achievement Report
+        parts = [f"""# 🎉 Betty Milestone Achievement Report
 **Milestone**: {report['milestone']}
 **Date**: {report['achievement_date']}
 
@@ -371,25 +639,24 @@ class BettyLearningReporter:
 
 ## Pattern Hall of Fame
 ### Most Valuable Patterns
-"""
+"""]
         
-        for i, pattern in enumerate(report['pattern_hall_of_fame'][:10], 1):
-            md += f"{i}. `{pattern['name']}` - {pattern['value_score']:.1f} value points\n"
+        parts.extend(f"{i}. `{pattern['name']}` - {pattern['value_score']:.1f} value points\n" for i, pattern in enumerate(report['pattern_hall_of_fame'][:10], 1))
         
-        md += f"""
+        parts.append(f"""
 ## Future Predictions
 {report['future_predictions']}
 
 ---
 *This milestone represents significant growth in Betty's intelligence and capability.*
-"""
+""")
         
-        return md
+        return "".join(parts)
     
     def format_session_report_markdown(self, report):
         """Format session report as markdown"""
         
-        md = f"""# Betty Session Learning Report
+        parts = [f"""# Betty Session Learning Report
 **Timestamp**: {report['timestamp']}
 **Session ID**: {report['session_id']}
 
@@ -397,46 +664,62 @@ class BettyLearningReporter:
 **Count**: {report['patterns_observed']}
 
 ### Patterns
-"""
+"""]
         
-        for pattern in report['patterns'][:10]:
-            md += f"- `{pattern}`\n"
+        parts.extend(f"- `{pattern}`\n" for pattern in report['patterns'][:10])
         
-        md += f"""
+        parts.append(f"""
 ## Learning Events
-"""
-        for event in report['learning_events'][:5]:
-            md += f"- {event}\n"
+""")
+        parts.extend(f"- {event}\n" for event in report['learning_events'][:5])
         
-        md += f"""
+        parts.append(f"""
 ## Knowledge Gained
 {report['knowledge_gained']}
-"""
+""")
         
-        return md
+        return "".join(parts)
     
     # Helper methods for metrics calculation
     
     def load_historical_patterns(self):
         """Load historical patterns from database"""
-        if self.patterns_db.exists():
-            with open(self.patterns_db) as f:
-                return json.load(f)
-        return []
+        try:
+            return load_json_bytes(self.patterns_db.read_bytes())
+        except FileNotFoundError:
+            return []
     
     def load_learning_metrics(self):
         """Load learning metrics from database"""
-        if self.metrics_db.parent.exists():
-            self.metrics_db.parent.mkdir(parents=True, exist_ok=True)
-        if self.metrics_db.exists():
-            with open(self.metrics_db) as f:
-                return json.load(f)
-        return {}
+        self.metrics_db.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            return load_json_bytes(self.metrics_db.read_bytes())
+        except FileNotFoundError:
+            return {}
     
     def get_patterns_by_date(self, date):
         """Get patterns learned on specific date"""
-        # Simplified - would query actual database
-        return [f"pattern_{i}" for i in range(5)]
+        return [pattern.get('name', 'unnamed') for pattern in self.patterns_in_period(date, date)]
+    
+    def get_most_used_patterns(self, date, limit=5):
+        """Patterns learned on date with the highest usage_count"""
+        return self.rank_patterns(self.patterns_in_period(date, date), 'usage_count', limit)
+    
+    def get_most_successful_patterns(self, date, limit=5):
+        """Successful patterns learned on date with the highest value_score"""
+        successful = [pattern for pattern in self.patterns_in_period(date, date) if pattern.get('success')]
+        return self.rank_patterns(successful, 'value_score', limit)
+    
+    def rank_patterns(self, patterns, key, limit):
+        """Top patterns by a numeric field (missing or non-numeric counts as 0), as (name, value) pairs"""
+        def score(pattern):
+            value = pattern.get(key)
+            return value if isinstance(value, (int, float)) else 0
+        
+        return [
+            (pattern.get('name', 'unnamed'), score(pattern))
+            for pattern in heapq.nlargest(limit, patterns, key=score)
+        ]
     
     def get_errors_resolved_by_date(self, date):
         """Count errors resolved on date"""
@@ -501,51 +784,45 @@ class BettyLearningReporter:
         ]
     
     def notify_report_ready(self, report_path, report):
-        """Send notification about report"""
-        try:
-            import requests
-            
-            report_type = report.get('type', 'unknown')
-            
-            if report_type == 'weekly':
-                title = "Weekly Learning Report"
-                metrics = report.get('metrics', {})
-                message = f"Patterns learned: {metrics.get('total_patterns_learned', 0)}\n"
-                message += f"Errors resolved: {metrics.get('total_errors_resolved', 0)}\n"
-                message += f"Time saved: {report.get('efficiency_trends', {}).get('time_saved', 0):.1f} hours"
-            elif report_type == 'milestone':
-                title = "Milestone Achievement!"
-                message = f"Betty has learned {report.get('milestone', 'many')} patterns!\n"
-                message += f"Check the full report for impact analysis."
-            else:
-                title = f"{report_type.title()} Learning Report"
-                message = f"New learning report available"
-            
-            message += f"\n\nReport: {report_path.name}"
-            
-            requests.post(
-                'https://ntfy.da-tech.io/Betty',
-                data=message.encode('utf-8'),
-                headers={
-                    'Title': title,
-                    'Priority': 'default' if report_type == 'weekly' else 'low',
-                    'Tags': 'learning,report,analytics'
-                },
-                timeout=2
-            )
-        except:
-            pass
+        """Send notification about report without holding up the hook"""
+        report_type = report.get('type', 'unknown')
+        
+        if report_type == 'weekly':
+            title = "Weekly Learning Report"
+            metrics = report.get('metrics', {})
+            message = f"Patterns learned: {metrics.get('total_patterns_learned', 0)}\n"
+            message += f"Errors resolved: {metrics.get('total_errors_resolved', 0)}\n"
+            message += f"Time saved: {report.get('efficiency_trends', {}).get('time_saved', 0):.1f} hours"
+        elif report_type == 'milestone':
+            title = "Milestone Achievement!"
+            message = f"Betty has learned {report.get('milestone', 'many')} patterns!\n"
+            message += f"Check the full report for impact analysis."
+        else:
+            title = f"{report_type.title()} Learning Report"
+            message = f"New learning report available"
+        
+        message += f"\n\nReport: {report_path.name}"
+        priority = 'default' if report_type == 'weekly' else 'low'
+        
+        # This is the hook's last step, so a joined thread would still make it wait;
+        # post from a detached child instead so the hook exits straight away
+        betty_ntfy.post_detached(title, message, priority, ['learning', 'report', 'analytics'])
     
     # Placeholder methods for complex calculations
     
     def count_patterns_in_period(self, start_date, end_date):
-        return 85
+        lo, hi = self.period_bounds(start_date, end_date)
+        return hi - lo
     
     def count_errors_resolved_in_period(self, start_date, end_date):
         return 42
     
     def count_unique_error_types(self, start_date, end_date):
-        return 12
+        return len({
+            pattern['error_type']
+            for pattern in self.patterns_in_period(start_date, end_date)
+            if pattern.get('error_type')
+        })
     
     def count_features_in_period(self, start_date, end_date):
         return 8
@@ -566,13 +843,13 @@ class BettyLearningReporter:
         return ['error_recovery', 'api_integration', 'database_migration']
     
     def analyze_common_errors(self, start_date, end_date):
-        return [
-            ('Permission denied', 15),
-            ('Module not found', 12),
-            ('Connection timeout', 8),
-            ('Syntax error', 6),
-            ('Docker not running', 4)
-        ]
+        counts = Counter(
+            pattern['error_type']
+            for pattern in self.patterns_in_period(start_date, end_date)
+            if pattern.get('error_type')
+        )
+        # Top 5 via a bounded heap rather than sorting every error type
+        return heapq.nlargest(5, counts.items(), key=itemgetter(1))
     
     def analyze_resolution_strategies(self, start_date, end_date):
         return {
@@ -596,19 +873,15 @@ class BettyLearningReporter:
         }
     
     def categorize_patterns(self):
-        return {
-            'error_handling': 120,
-            'automation': 85,
-            'testing': 64,
-            'deployment': 45,
-            'optimization': 38
-        }
+        return dict(self.summary['category_counts'])
     
     def calculate_overall_success_rate(self):
-        return 0.825  # 82.5%
+        attempts = self.summary['successes'] + self.summary['failures']
+        return self.summary['successes'] / attempts if attempts else 0.0
     
     def calculate_avg_resolution_time(self):
-        return 3.5  # minutes
+        count = self.summary['resolution_count']
+        return self.summary['resolution_time_total'] / count if count else 0.0  # minutes
     
     def calculate_knowledge_density(self):
         return 2.3  # patterns per session
@@ -623,7 +896,7 @@ class BettyLearningReporter:
         return "Mastery in error handling, developing in optimization"
     
     def calculate_total_time_saved(self):
-        return 156.5  # hours
+        return self.summary['total_time_saved']  # hours
     
     def calculate_errors_prevented(self):
         return 234
@@ -637,17 +910,9 @@ class BettyLearningReporter:
         hourly_rate = 150  # $/hour
         return self.calculate_total_time_saved() * hourly_rate
     
-    def get_most_valuable_patterns(self, limit=20):
-        # Return patterns with highest value scores
-        patterns = []
-        for i in range(limit):
-            patterns.append({
-                'name': f'pattern_{i}',
-                'value_score': 100 - i * 3,
-                'usage_count': 50 - i,
-                'time_saved': 10 - i * 0.3
-            })
-        return patterns
+    def get_most_valuable_patterns(self, limit=HALL_OF_FAME_SIZE):
+        # Kept up to date by fold_into_summary alongside the other milestone aggregates
+        return [entry for _, _, entry in heapq.nlargest(limit, self.summary['top_patterns'])]
     
     def predict_future_learning(self):
         return """Based on current learning velocity and pattern complexity progression,
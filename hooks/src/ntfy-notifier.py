@@ -4,15 +4,23 @@ ABOUTME: Betty NTFY Notification Hook - Sends Claude Code notifications to Andre
 ABOUTME: Filters and forwards important events to ntfy.sh for real-time monitoring
 """
 
-import json
+import re
 import sys
-import requests
-from datetime import datetime
+import time
+from functools import lru_cache
 import os
 
-# NTFY Configuration - Andre's personal server
-NTFY_URL = "https://ntfy.da-tech.io"
-NTFY_TOPIC = os.environ.get('BETTY_NTFY_TOPIC', 'Betty')  # Andre's Betty topic
+import betty_ntfy
+from betty_io import dump_json_line, ensure_dir, get_log, load_json_bytes
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# Kill switches: skip NTFY entirely, or skip the JSONL logs
+NTFY_DISABLED = bool(os.environ.get('BETTY_NTFY_DISABLE'))
+LOGS_DISABLED = bool(os.environ.get('BETTY_DISABLE_LOGS'))
 NTFY_PRIORITY = {
     'error': 'high',
     'warning': 'default', 
@@ -31,140 +39,159 @@ NOTIFY_PATTERNS = {
     'security_events': True   # Security-related events
 }
 
+# Notification rules in priority order: every keyword group must have at least one hit
+NOTIFY_RULES = [
+    ((frozenset({'error', 'failed'}),), 'error_detected'),
+    ((frozenset({'warning', 'warn'}),), 'warning'),
+    ((frozenset({'completed', 'finished', 'done'}),), 'task_complete'),
+    ((frozenset({'test'}), frozenset({'fail', 'error'})), 'test_failure'),
+    ((frozenset({'deploy', 'production'}),), 'deployment'),
+    ((frozenset({'security', 'injection', 'blocked'}),), 'security'),
+    ((frozenset({'betty'}), frozenset({'learned', 'captured'})), 'betty_learning'),
+    ((frozenset({'docker', 'container'}), frozenset({'stopped', 'crashed'})), 'docker_issue'),
+]
+LONG_RUNNING_REASONS = {'task_complete': 'long_task_complete'}
+
+# Every keyword the rules look for, matched in one pass over the message
+NOTIFY_KEYWORDS = frozenset().union(*(group for groups, _ in NOTIFY_RULES for group in groups))
+
+if ahocorasick is not None:
+    KEYWORD_AUTOMATON = ahocorasick.Automaton()
+    for keyword in NOTIFY_KEYWORDS:
+        KEYWORD_AUTOMATON.add_word(keyword, keyword)
+    KEYWORD_AUTOMATON.make_automaton()
+else:
+    KEYWORD_AUTOMATON = None
+
+# Priority rules in order: (notification type, message pattern, priority). Patterns are
+# compiled once and case-insensitive so the message needn't be lowercased
+PRIORITY_RULES = [
+    ('error', re.compile(r'failed', re.IGNORECASE), 'high'),
+    ('warning', re.compile(r'security', re.IGNORECASE), 'default'),
+    (None, re.compile(r'completed|success', re.IGNORECASE), 'low'),
+]
+
 def send_ntfy_notification(title, message, priority='default', tags=None):
     """Send notification to NTFY"""
     
-    # Construct NTFY URL
-    url = f"{NTFY_URL}/{NTFY_TOPIC}"
-    
-    # NTFY expects ASCII in headers, move emojis to message
-    if any(ord(c) > 127 for c in title):
-        # Move emoji to message body
-        message = f"{title}\n\n{message}"
-        title = title.encode('ascii', 'ignore').decode('ascii').strip() or 'Betty Notification'
-    
-    # Prepare headers
-    headers = {
-        'Title': title,
-        'Priority': priority,
-    }
-    
-    # Add tags if provided
-    if tags:
-        headers['Tags'] = ','.join(tags)
-    
     # Add click action to open Betty dashboard
-    headers['Click'] = 'https://betty.blockonauts.io/dashboard'
-    
-    try:
-        response = requests.post(
-            url,
-            data=message.encode('utf-8'),
-            headers=headers,
-            timeout=5
-        )
-        
-        if response.status_code == 200:
-            return True
-        else:
-            print(f"Failed to send NTFY: {response.status_code}", file=sys.stderr)
-            return False
-            
-    except Exception as e:
-        print(f"NTFY error: {e}", file=sys.stderr)
-        return False
+    sent = betty_ntfy.post(
+        title,
+        message,
+        priority=priority,
+        tags=tags,
+        headers={'Click': 'https://betty.blockonauts.io/dashboard'}
+    )
+    if not sent:
+        print(f"Failed to send NTFY (see {betty_ntfy.FAILURE_LOG})", file=sys.stderr)
+    return sent
+
+def deliver_notification(notification, notification_type, message, reason, timestamp):
+    """Send a notification and log it once NTFY accepts it (runs in a detached child)"""
+    if send_ntfy_notification(**notification) and not LOGS_DISABLED:
+        log_notification(notification_type, message, reason, timestamp)
 
 def process_notification():
     """Process Claude Code notification and forward to NTFY if relevant"""
     
+    if NTFY_DISABLED and LOGS_DISABLED:
+        return 0
+    
     try:
         # Read hook data from stdin
-        hook_data = json.load(sys.stdin)
+        hook_data = load_json_bytes(sys.stdin.buffer.read())
         
         # Extract notification details
         notification_type = hook_data.get('type', 'info')
         message = hook_data.get('message', '')
         context = hook_data.get('context', {})
-        timestamp = datetime.now().strftime('%H:%M:%S')
+        
+        # One clock read per hook, shared by the message and both log entries
+        now = time.localtime()
+        timestamp = time.strftime('%Y-%m-%dT%H:%M:%S', now)
         
         # Determine if we should notify Andre
-        should_notify, reason = should_send_notification(notification_type, message, context)
+        should_notify, reason = False, None
+        if not NTFY_DISABLED:
+            should_notify, reason = should_send_notification(notification_type, message, context)
         
         if should_notify:
             # Prepare notification
             title = format_title(notification_type, reason)
-            formatted_message = format_message(message, context, timestamp)
+            formatted_message = format_message(message, context, time.strftime('%H:%M:%S', now))
             priority = determine_priority(notification_type, message)
             tags = determine_tags(notification_type, reason)
             
-            # Send to NTFY
-            success = send_ntfy_notification(
-                title=title,
-                message=formatted_message,
-                priority=priority,
-                tags=tags
+            # Send to NTFY from a detached child so the hook exits without waiting
+            betty_ntfy.run_detached(
+                deliver_notification,
+                {
+                    'title': title,
+                    'message': formatted_message,
+                    'priority': priority,
+                    'tags': tags
+                },
+                notification_type,
+                message,
+                reason,
+                timestamp
             )
-            
-            if success:
-                log_notification(notification_type, message, reason)
         
         # Log all notifications for Betty's learning
-        log_for_betty(hook_data)
+        if not LOGS_DISABLED:
+            log_for_betty(hook_data, timestamp)
         
     except Exception as e:
-        # Emergency notification for hook failure
-        send_ntfy_notification(
-            title="⚠️ Betty Hook Error",
-            message=f"Notification hook failed: {str(e)}",
-            priority='high',
-            tags=['warning', 'betty']
+        # Emergency notification for hook failure (also detached; a failed post is
+        # recorded in betty_ntfy.FAILURE_LOG)
+        if NTFY_DISABLED:
+            print(f"Notification hook failed: {e}", file=sys.stderr)
+            return 1
+        betty_ntfy.run_detached(
+            send_ntfy_notification,
+            "⚠️ Betty Hook Error",
+            f"Notification hook failed: {str(e)}",
+            'high',
+            ['warning', 'betty']
         )
         return 1
     
     return 0
 
+def find_keywords(message_lower):
+    """Set of NOTIFY_KEYWORDS occurring anywhere in the (lowercased) message"""
+    if KEYWORD_AUTOMATON is not None:
+        return {keyword for _, keyword in KEYWORD_AUTOMATON.iter(message_lower)}
+    return {keyword for keyword in NOTIFY_KEYWORDS if keyword in message_lower}
+
 def should_send_notification(notification_type, message, context):
     """Determine if notification should be sent to Andre"""
-    
-    message_lower = message.lower()
+    return classify_notification(
+        notification_type,
+        message.lower(),
+        context.get('duration', 0) > 30000  # Long running task
+    )
+
+# The decision is a pure function of these three values, so repeated notices are a
+# cache hit. The cache is process-local: it only pays off when the hook handles
+# several notifications in the same interpreter.
+@lru_cache(maxsize=2048)
+def classify_notification(notification_type, message_lower, long_running):
+    """Return (should_notify, reason) for a lowercased notification message"""
     
     # High priority - always notify
     if notification_type == 'error':
         return True, 'error'
     
-    if 'error' in message_lower or 'failed' in message_lower:
-        return True, 'error_detected'
-    
-    if 'warning' in message_lower or 'warn' in message_lower:
-        return True, 'warning'
-    
-    # Task completions
-    if 'completed' in message_lower or 'finished' in message_lower or 'done' in message_lower:
-        if context.get('duration', 0) > 30000:  # Long running task
-            return True, 'long_task_complete'
-        return True, 'task_complete'
-    
-    # Test failures
-    if 'test' in message_lower and ('fail' in message_lower or 'error' in message_lower):
-        return True, 'test_failure'
+    hits = find_keywords(message_lower)
+    if not hits:
+        return False, None
     
-    # Deployment events
-    if 'deploy' in message_lower or 'production' in message_lower:
-        return True, 'deployment'
-    
-    # Security events
-    if 'security' in message_lower or 'injection' in message_lower or 'blocked' in message_lower:
-        return True, 'security'
-    
-    # Betty-specific events
-    if 'betty' in message_lower:
-        if 'learned' in message_lower or 'captured' in message_lower:
-            return True, 'betty_learning'
-    
-    # Docker events
-    if 'docker' in message_lower or 'container' in message_lower:
-        if 'stopped' in message_lower or 'crashed' in message_lower:
-            return True, 'docker_issue'
+    for groups, reason in NOTIFY_RULES:
+        if all(not hits.isdisjoint(group) for group in groups):
+            if long_running:
+                reason = LONG_RUNNING_REASONS.get(reason, reason)
+            return True, reason
     
     # Default: don't spam Andre with everything
     return False, None
@@ -212,16 +239,9 @@ def format_message(message, context, timestamp):
 def determine_priority(notification_type, message):
     """Determine NTFY priority"""
     
-    message_lower = message.lower()
-    
-    if notification_type == 'error' or 'failed' in message_lower:
-        return 'high'
-    
-    if notification_type == 'warning' or 'security' in message_lower:
-        return 'default'
-    
-    if 'completed' in message_lower or 'success' in message_lower:
-        return 'low'
+    for rule_type, pattern, priority in PRIORITY_RULES:
+        if notification_type == rule_type or pattern.search(message):
+            return priority
     
     return 'min'
 
@@ -246,34 +266,31 @@ def determine_tags(notification_type, reason):
     
     return tags[:4]  # NTFY supports max 4 tags
 
-def log_notification(notification_type, message, reason):
+def log_notification(notification_type, message, reason, timestamp):
     """Log sent notifications"""
     
     log_entry = {
-        'timestamp': datetime.now().isoformat(),
+        'timestamp': timestamp,
         'type': notification_type,
         'reason': reason,
         'message': message[:100],  # First 100 chars
         'sent_to_ntfy': True
     }
     
+    # Written straight through: the detached child exits without running atexit
     log_file = '/home/jarvis/projects/Betty/logs/ntfy-notifications.jsonl'
-    os.makedirs(os.path.dirname(log_file), exist_ok=True)
-    
-    with open(log_file, 'a') as f:
-        f.write(json.dumps(log_entry) + '\n')
+    ensure_dir(os.path.dirname(log_file))
+    with open(log_file, 'ab') as f:
+        f.write(dump_json_line(log_entry))
 
-def log_for_betty(hook_data):
+def log_for_betty(hook_data, timestamp):
     """Log all notifications for Betty's learning"""
     
     log_file = '/home/jarvis/projects/Betty/capture/notifications.jsonl'
-    os.makedirs(os.path.dirname(log_file), exist_ok=True)
-    
-    with open(log_file, 'a') as f:
-        f.write(json.dumps({
-            'timestamp': datetime.now().isoformat(),
-            **hook_data
-        }) + '\n')
+    get_log(log_file).write(dump_json_line({
+        'timestamp': timestamp,
+        **hook_data
+    }))
 
 if __name__ == '__main__':
     sys.exit(process_notification())
\ No newline at end of file
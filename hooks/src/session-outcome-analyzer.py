@@ -4,25 +4,95 @@ ABOUTME: Betty Stop Hook - Analyzes complete session outcomes
 ABOUTME: Captures solutions, patterns, and learns from every session
 """
 
-import json
+import re
 import sys
 import os
-from datetime import datetime
+import time
+from dataclasses import dataclass, field
+from itertools import islice
 from pathlib import Path
 import hashlib
 
+import betty_ntfy
+from betty_io import atomic_write_bytes, dump_json_bytes, dump_json_line, ensure_dir, get_log, load_json_bytes
+
+SUCCESS_PATTERN = re.compile(r'success|complete')
+
+# Known workflows as tool-name sequences, in match priority order
+KNOWN_PATTERNS = [
+    (('Read', 'Edit', 'Bash'), 'modify_and_test'),
+    (('Grep', 'Read', 'Edit'), 'search_and_fix'),
+    (('Write', 'Bash'), 'create_and_run'),
+    (('Bash', 'Read', 'Edit', 'Bash'), 'debug_cycle'),
+    (('MultiEdit', 'Bash'), 'bulk_change_and_test'),
+]
+PATTERN_WINDOW = 10  # Only the first 10 tools characterize a session
+
+def build_pattern_trie(patterns):
+    """Trie over tool names; the None key of a node holds (priority, name) of a pattern ending there"""
+    trie = {}
+    for priority, (tools, name) in enumerate(patterns):
+        node = trie
+        for tool in tools:
+            node = node.setdefault(tool, {})
+        node[None] = (priority, name)
+    return trie
+
+PATTERN_TRIE = build_pattern_trie(KNOWN_PATTERNS)
+
+# Keyword probes over the session's tool text, in report order
+FAILURE_CAUSES = [
+    ('permission denied', 'Permission issues'),
+    ('not found', 'Missing files or commands'),
+    ('syntax error', 'Syntax errors in code'),
+]
+RECOVERY_SUGGESTIONS = [
+    ('permission', 'Check file permissions'),
+    ('docker', 'Verify Docker is running'),
+]
+
+# Caps on what a stored solution/failure keeps from a session
+MAX_TOOL_SEQUENCE = 20
+MAX_FILE_CHANGES = 20
+MAX_COMMANDS = 10
+MAX_SUCCESS_INDICATORS = 5
+MAX_ERROR_POINTS = 5
+
+def pattern_digest(pattern):
+    """Short fingerprint of a tool sequence (8 hex chars), identical on every machine"""
+    return hashlib.blake2b(pattern.encode(), digest_size=4).hexdigest()
+
+@dataclass
+class ToolScan:
+    """Per-session facts gathered by BettySessionAnalyzer.scan_tools"""
+    sequence: list = field(default_factory=list)
+    changed_files: set = field(default_factory=set)
+    commands: list = field(default_factory=list)
+    seen_commands: set = field(default_factory=set)
+    success_indicators: list = field(default_factory=list)
+    error_points: list = field(default_factory=list)
+    last_success: dict = None
+    tests_failed: bool = False
+    blob: str = ''
+
 class BettySessionAnalyzer:
     def __init__(self):
         self.betty_dir = Path('/home/jarvis/projects/Betty')
         self.solutions_dir = self.betty_dir / 'solutions'
         self.patterns_dir = self.betty_dir / 'patterns'
         self.metrics_file = self.betty_dir / 'metrics' / 'sessions.json'
+        self.metrics_log = self.betty_dir / 'metrics' / 'sessions.jsonl'
+        
+        # One clock read per hook, shared by every record and filename it writes
+        now = time.localtime()
+        self.timestamp = time.strftime('%Y-%m-%dT%H:%M:%S', now)
+        self.file_stamp = time.strftime('%Y%m%d_%H%M%S', now)
         
     def analyze_session(self):
         """Analyze complete session when Claude stops"""
         try:
             # Get session data from stdin
-            hook_data = json.load(sys.stdin)
+            hook_data = load_json_bytes(sys.stdin.buffer.read())
             
             # Extract session info
             session_id = hook_data.get('session_id', '')
@@ -31,20 +101,23 @@ class BettySessionAnalyzer:
             tools_used = hook_data.get('tools_used', [])
             final_state = hook_data.get('final_state', {})
             
+            # Everything the analysis needs from the tools, gathered in one pass
+            scan = self.scan_tools(tools_used)
+            
             # Determine success
-            success = self.determine_success(final_state, tools_used)
+            success = self.determine_success(final_state, scan)
             
             # Extract pattern
-            pattern = self.extract_pattern(tools_used)
+            pattern = self.extract_pattern(scan.sequence)
             
             # If successful, capture solution
             if success:
-                solution = self.capture_solution(prompt, tools_used, pattern)
+                solution = self.capture_solution(prompt, tools_used, pattern, scan)
                 self.store_solution(solution)
                 print(f"✅ Betty: Solution captured - Pattern: {pattern}", file=sys.stderr)
             else:
                 # Analyze failure
-                failure = self.analyze_failure(prompt, tools_used, final_state)
+                failure = self.analyze_failure(prompt, final_state, scan)
                 self.store_failure(failure)
                 print(f"📝 Betty: Failure analysis stored", file=sys.stderr)
             
@@ -59,7 +132,73 @@ class BettySessionAnalyzer:
             
         return 0
     
-    def determine_success(self, final_state, tools_used):
+    def scan_tools(self, tools_used):
+        """Walk the session's tools once, collecting every field the analysis reports"""
+        scan = ToolScan()
+        blob_parts = []
+        
+        for i, tool in enumerate(tools_used):
+            name = tool.get('name', '')
+            params = tool.get('params', {})
+            output = str(tool.get('output', '')).lower()
+            
+            # Only the output, error and command feed the keyword probes; str(tool)
+            # would serialize every param and nested structure as well
+            blob_parts.append(output)
+            if tool.get('error'):
+                blob_parts.append(str(tool['error']).lower())
+            if params.get('command'):
+                blob_parts.append(str(params['command']).lower())
+            
+            if name:
+                scan.sequence.append(name)
+            
+            # Files that were changed
+            if name in ['Edit', 'MultiEdit', 'Write']:
+                file_path = params.get('file_path', '')
+                if file_path and len(scan.changed_files) < MAX_FILE_CHANGES:
+                    scan.changed_files.add(file_path)
+            
+            if name == 'Bash':
+                # Commands that were run
+                cmd = params.get('command', '')
+                if cmd and cmd not in scan.seen_commands and len(scan.commands) < MAX_COMMANDS:
+                    scan.seen_commands.add(cmd)
+                    scan.commands.append(cmd[:100])
+                
+                # Test runs that reported failures
+                if 'test' in tool.get('command', '').lower():
+                    if 'failed' in output or 'error' in output:
+                        scan.tests_failed = True
+            
+            # What indicated success
+            if len(scan.success_indicators) < MAX_SUCCESS_INDICATORS:
+                if SUCCESS_PATTERN.search(output):
+                    scan.success_indicators.append(f"{tool.get('name')}: success/complete found")
+                if 'pass' in output and 'test' in output:
+                    scan.success_indicators.append(f"{tool.get('name')}: tests passing")
+            
+            # Where errors occurred
+            if len(scan.error_points) < MAX_ERROR_POINTS and (tool.get('error') or 'error' in output):
+                scan.error_points.append({
+                    'step': i,
+                    'tool': tool.get('name'),
+                    'error': str(tool.get('error', ''))[:200]
+                })
+            
+            # Last successful operation
+            if not tool.get('error') and tool.get('output'):
+                scan.last_success = {
+                    'step': i,
+                    'tool': tool.get('name'),
+                    'operation': str(params)[:100]
+                }
+        
+        # Lowercased output/error/command text of every tool for the keyword probes
+        scan.blob = '\n'.join(blob_parts)
+        return scan
+    
+    def determine_success(self, final_state, scan):
         """Determine if session was successful"""
         
         # Check for error indicators
@@ -67,54 +206,49 @@ class BettySessionAnalyzer:
             return False
             
         # Check if tests were run and passed
-        bash_tools = [t for t in tools_used if t.get('name') == 'Bash']
-        for tool in bash_tools:
-            output = tool.get('output', '')
-            if 'test' in tool.get('command', '').lower():
-                if 'failed' in output.lower() or 'error' in output.lower():
-                    return False
+        if scan.tests_failed:
+            return False
                     
         # Check for completion indicators
-        if any('complete' in str(t).lower() for t in tools_used):
+        if 'complete' in scan.blob:
             return True
             
         # Default to success if no errors
         return final_state.get('errors', 0) == 0
     
-    def extract_pattern(self, tools_used):
-        """Extract workflow pattern from tools"""
+    def extract_pattern(self, sequence):
+        """Extract workflow pattern from the tool name sequence"""
         
-        # Create tool sequence
-        sequence = []
-        for tool in tools_used:
-            tool_name = tool.get('name', '')
-            if tool_name:
-                sequence.append(tool_name)
+        # Sessions without tools share one bucket rather than the hash of ''
+        if not sequence:
+            return 'empty'
         
-        # Simplify sequence
-        pattern = '->'.join(sequence[:10])  # First 10 tools
+        window = sequence[:PATTERN_WINDOW]
         
-        # Match against known patterns
-        known_patterns = {
-            'Read->Edit->Bash': 'modify_and_test',
-            'Grep->Read->Edit': 'search_and_fix',
-            'Write->Bash': 'create_and_run',
-            'Bash->Read->Edit->Bash': 'debug_cycle',
-            'MultiEdit->Bash': 'bulk_change_and_test'
-        }
+        # Walk the known-pattern trie from each position; the highest priority match wins
+        best = None
+        for start in range(len(window)):
+            node = PATTERN_TRIE
+            for tool in islice(window, start, None):
+                node = node.get(tool)
+                if node is None:
+                    break
+                match = node.get(None)
+                if match and (best is None or match < best):
+                    best = match
+            if best and best[0] == 0:
+                break
+        if best:
+            return best[1]
         
-        for known, name in known_patterns.items():
-            if known in pattern:
-                return name
-                
         # Generate hash for unknown pattern
-        return f"pattern_{hashlib.md5(pattern.encode()).hexdigest()[:8]}"
+        return f"pattern_{pattern_digest('->'.join(window))}"
     
-    def capture_solution(self, prompt, tools_used, pattern):
+    def capture_solution(self, prompt, tools_used, pattern, scan):
         """Capture successful solution"""
         
         solution = {
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': self.timestamp,
             'problem': prompt[:500],
             'pattern': pattern,
             'tool_sequence': [
@@ -122,25 +256,25 @@ class BettySessionAnalyzer:
                     'name': t.get('name'),
                     'key_params': self.extract_key_params(t)
                 }
-                for t in tools_used[:20]  # First 20 tools
+                for t in islice(tools_used, MAX_TOOL_SEQUENCE)
             ],
-            'file_changes': self.extract_file_changes(tools_used),
-            'commands_run': self.extract_commands(tools_used),
-            'success_indicators': self.extract_success_indicators(tools_used)
+            'file_changes': list(scan.changed_files),
+            'commands_run': scan.commands,
+            'success_indicators': scan.success_indicators[:MAX_SUCCESS_INDICATORS]
         }
         
         return solution
     
-    def analyze_failure(self, prompt, tools_used, final_state):
+    def analyze_failure(self, prompt, final_state, scan):
         """Analyze failed session"""
         
         failure = {
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': self.timestamp,
             'problem': prompt[:500],
-            'error_points': self.identify_error_points(tools_used),
-            'last_successful_step': self.find_last_success(tools_used),
-            'potential_causes': self.identify_failure_causes(tools_used, final_state),
-            'recovery_suggestions': self.suggest_recovery(tools_used)
+            'error_points': scan.error_points,
+            'last_successful_step': scan.last_success,
+            'potential_causes': self.identify_failure_causes(scan, final_state),
+            'recovery_suggestions': self.suggest_recovery(scan)
         }
         
         return failure
@@ -159,163 +293,108 @@ class BettySessionAnalyzer:
             
         return {}
     
-    def extract_file_changes(self, tools_used):
-        """Extract files that were changed"""
-        changed_files = set()
-        
-        for tool in tools_used:
-            if tool.get('name') in ['Edit', 'MultiEdit', 'Write']:
-                file_path = tool.get('params', {}).get('file_path', '')
-                if file_path:
-                    changed_files.add(file_path)
-                    
-        return list(changed_files)[:20]  # Max 20 files
-    
-    def extract_commands(self, tools_used):
-        """Extract commands that were run"""
-        commands = []
-        
-        for tool in tools_used:
-            if tool.get('name') == 'Bash':
-                cmd = tool.get('params', {}).get('command', '')
-                if cmd and cmd not in commands:
-                    commands.append(cmd[:100])
-                    
-        return commands[:10]  # Max 10 commands
-    
-    def extract_success_indicators(self, tools_used):
-        """Extract what indicated success"""
-        indicators = []
-        
-        for tool in tools_used:
-            output = str(tool.get('output', ''))
-            if 'success' in output.lower() or 'complete' in output.lower():
-                indicators.append(f"{tool.get('name')}: success/complete found")
-            if 'pass' in output.lower() and 'test' in output.lower():
-                indicators.append(f"{tool.get('name')}: tests passing")
-                
-        return indicators[:5]
-    
-    def identify_error_points(self, tools_used):
-        """Identify where errors occurred"""
-        error_points = []
-        
-        for i, tool in enumerate(tools_used):
-            if tool.get('error') or 'error' in str(tool.get('output', '')).lower():
-                error_points.append({
-                    'step': i,
-                    'tool': tool.get('name'),
-                    'error': str(tool.get('error', ''))[:200]
-                })
-                
-        return error_points[:5]
-    
-    def find_last_success(self, tools_used):
-        """Find last successful operation"""
-        for i in range(len(tools_used) - 1, -1, -1):
-            tool = tools_used[i]
-            if not tool.get('error') and tool.get('output'):
-                return {
-                    'step': i,
-                    'tool': tool.get('name'),
-                    'operation': str(tool.get('params', {}))[:100]
-                }
-        return None
-    
-    def identify_failure_causes(self, tools_used, final_state):
+    def identify_failure_causes(self, scan, final_state):
         """Identify potential failure causes"""
-        causes = []
-        
         # Check for common failure patterns
-        if any('permission denied' in str(t).lower() for t in tools_used):
-            causes.append('Permission issues')
-        if any('not found' in str(t).lower() for t in tools_used):
-            causes.append('Missing files or commands')
-        if any('syntax error' in str(t).lower() for t in tools_used):
-            causes.append('Syntax errors in code')
-            
-        return causes
+        return [cause for keyword, cause in FAILURE_CAUSES if keyword in scan.blob]
     
-    def suggest_recovery(self, tools_used):
+    def suggest_recovery(self, scan):
         """Suggest recovery actions"""
-        suggestions = []
-        
         # Based on failure patterns
-        if any('permission' in str(t).lower() for t in tools_used):
-            suggestions.append('Check file permissions')
-        if any('docker' in str(t).lower() for t in tools_used):
-            suggestions.append('Verify Docker is running')
-            
-        return suggestions
+        return [suggestion for keyword, suggestion in RECOVERY_SUGGESTIONS if keyword in scan.blob]
     
     def store_solution(self, solution):
         """Store successful solution"""
-        self.solutions_dir.mkdir(parents=True, exist_ok=True)
+        ensure_dir(self.solutions_dir)
         
         # Create filename from pattern
-        filename = f"{solution['pattern']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        filename = f"{solution['pattern']}_{self.file_stamp}.json"
         
-        with open(self.solutions_dir / filename, 'w') as f:
-            json.dump(solution, f, indent=2)
+        atomic_write_bytes(self.solutions_dir / filename, dump_json_bytes(solution, indent=True))
     
     def store_failure(self, failure):
         """Store failure analysis"""
         failures_dir = self.betty_dir / 'failures'
-        failures_dir.mkdir(parents=True, exist_ok=True)
+        ensure_dir(failures_dir)
         
-        filename = f"failure_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        filename = f"failure_{self.file_stamp}.json"
         
-        with open(failures_dir / filename, 'w') as f:
-            json.dump(failure, f, indent=2)
+        atomic_write_bytes(failures_dir / filename, dump_json_bytes(failure, indent=True))
     
     def update_metrics(self, success, duration, pattern):
-        """Update session metrics"""
-        self.metrics_file.parent.mkdir(parents=True, exist_ok=True)
-        
-        # Load existing metrics
+        """Record session metrics as one appended line (aggregated by compute_metrics)"""
+        get_log(str(self.metrics_log)).write(dump_json_line({
+            'pattern': pattern,
+            'success': success,
+            'duration': duration,
+            'ts': self.timestamp
+        }))
+    
+    def compute_metrics(self, log_path=None):
+        """Aggregate metrics: the compacted sessions.json plus every session logged since"""
         metrics = {}
         if self.metrics_file.exists():
-            with open(self.metrics_file) as f:
-                metrics = json.load(f)
+            metrics = load_json_bytes(self.metrics_file.read_bytes())
+        patterns = metrics.setdefault('patterns', {})
         
-        # Update metrics
-        if 'patterns' not in metrics:
-            metrics['patterns'] = {}
-        if pattern not in metrics['patterns']:
-            metrics['patterns'][pattern] = {'count': 0, 'success': 0, 'total_duration': 0}
-            
-        metrics['patterns'][pattern]['count'] += 1
-        if success:
-            metrics['patterns'][pattern]['success'] += 1
-        metrics['patterns'][pattern]['total_duration'] += duration
+        try:
+            with open(log_path or self.metrics_log, 'rb') as f:
+                for line in f:
+                    try:
+                        session = load_json_bytes(line)
+                    except ValueError:
+                        continue  # Torn line from an interrupted write
+                    pattern = patterns.setdefault(
+                        session['pattern'], {'count': 0, 'success': 0, 'total_duration': 0}
+                    )
+                    pattern['count'] += 1
+                    if session['success']:
+                        pattern['success'] += 1
+                    pattern['total_duration'] += session['duration']
+        except FileNotFoundError:
+            pass
         
-        # Save metrics
-        with open(self.metrics_file, 'w') as f:
-            json.dump(metrics, f, indent=2)
+        return metrics
+    
+    def compact_metrics(self):
+        """Fold sessions.jsonl into sessions.json and start a fresh log"""
+        # Move the log aside first so sessions appended meanwhile aren't lost. A
+        # leftover from an interrupted compaction is folded in first, on its own.
+        pending = self.metrics_log.with_suffix('.jsonl.compacting')
+        if not pending.exists():
+            try:
+                os.replace(self.metrics_log, pending)
+            except FileNotFoundError:
+                return 0
+        
+        # sessions.json records the identity of the log it last absorbed, so a crash between
+        # its write and the unlink below doesn't fold the same sessions in twice
+        stat = pending.stat()
+        identity = [stat.st_ino, stat.st_size, stat.st_mtime_ns]
+        metrics = self.compute_metrics(pending)
+        if metrics.get('compacted') != identity:
+            metrics['compacted'] = identity
+            atomic_write_bytes(self.metrics_file, dump_json_bytes(metrics, indent=True))
+        pending.unlink()
+        
+        print(f"📊 Betty: Compacted metrics for {len(metrics['patterns'])} patterns", file=sys.stderr)
+        return 0
     
     def send_session_summary(self, success, duration, pattern):
-        """Send session summary via NTFY"""
-        try:
-            import requests
-            
-            status = "✅ Success" if success else "❌ Failed"
-            duration_min = duration / 60000  # Convert to minutes
-            
-            message = f"Pattern: {pattern}\nDuration: {duration_min:.1f} min"
-            
-            requests.post(
-                'https://ntfy.da-tech.io/Betty',
-                data=message.encode('utf-8'),
-                headers={
-                    'Title': f'Session Complete: {status}',
-                    'Priority': 'low' if success else 'default',
-                    'Tags': 'session,complete'
-                },
-                timeout=2
-            )
-        except:
-            pass
+        """Send session summary to NTFY from a detached child without waiting on the network"""
+        status = "✅ Success" if success else "❌ Failed"
+        duration_min = duration / 60000  # Convert to minutes
+        
+        message = f"Pattern: {pattern}\nDuration: {duration_min:.1f} min"
+        betty_ntfy.post_detached(
+            f'Session Complete: {status}',
+            message,
+            priority='low' if success else 'default',
+            tags=['session', 'complete']
+        )
 
 if __name__ == '__main__':
     analyzer = BettySessionAnalyzer()
+    if '--compact-metrics' in sys.argv[1:]:
+        sys.exit(analyzer.compact_metrics())
     sys.exit(analyzer.analyze_session())
\ No newline at end of file
@@ -4,88 +4,183 @@ ABOUTME: Smart Completion Guardian - Blocks completion until all tests pass
 ABOUTME: Provides detailed fix instructions for Claude to quickly resolve issues
 """
 
+import atexit
 import json
+import os
+import signal
 import sys
+import time
 import subprocess
+import threading
 from pathlib import Path
 import re
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from collections import defaultdict
+from functools import lru_cache, partial
+from datetime import datetime
+
+from betty_io import atomic_write_bytes, dump_json_bytes
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+try:
+    import pygit2
+except ImportError:
+    pygit2 = None
+
+BETTY_DIR = Path('/home/jarvis/projects/Betty')
+
+# Phrases that mark an echo/print as a completion claim, as one case-insensitive
+# alternation so a command is scanned once
+COMPLETION_PATTERNS = (
+    'all done', 'complete', 'finished', 'ready',
+    'all set', "that's it", 'task complete'
+)
+COMPLETION_RE = re.compile('|'.join(map(re.escape, COMPLETION_PATTERNS)), re.IGNORECASE)
+
+# Compact encoder for log lines, built once
+JSON_DUMPS = json.JSONEncoder(separators=(',', ':')).encode
+
+# Compiler/linter output parsers, compiled once at import. Anchored to line starts so
+# the engine doesn't retry every offset of long outputs
+TS_ERROR_PATTERN = re.compile(r'^(\S[^(\n]*)\((\d+),(\d+)\): error TS\d+: (.+)$', re.MULTILINE)
+LINT_ERROR_PATTERN = re.compile(r'^(\S[^:\n]+):(\d+):(\d+)\s+error\s+(.+)$', re.MULTILINE)
+
+# Directories never worth descending into when looking for recently edited sources
+SKIP_DIRS = {'node_modules', '.git', 'venv', '.venv', '__pycache__', 'dist', 'build'}
+
+# Tool output past this many bytes is never decoded or scanned - the first few errors are all we report
+OUTPUT_LIMIT = 65536
+
+# Issues the block message lists per type; the rest are only counted
+MAX_ISSUES_PER_TYPE = 3
+
+# Top-level directories the Betty hooks write their own bookkeeping into - not project changes
+HOOK_DIRS = {'logs', 'metrics', 'patterns', 'state', 'reports', 'security', 'fixes',
+             'test-results', 'capture', 'auto-generated'}
+
+# Results of the last run, reused while nothing in the tree has changed. Kept under state/,
+# which tree_signature skips, so writing it doesn't itself count as a change
+CHECK_CACHE = BETTY_DIR / 'state' / 'completion-cache.json'
+CHECK_CACHE_TTL = 600  # Same window check_python uses for "recently edited"
+
+# Block message section headers per issue type, and the closing hint
+ISSUE_TYPE_HEADERS = {
+    'typescript': "📘 TypeScript Errors:\n",
+    'python_syntax': "🐍 Python Syntax Errors:\n",
+    'lint': "🧹 Linting Errors:\n",
+    'docker_compose': "🐳 Docker Configuration:\n",
+    'git_warning': "⚠️ Git Warnings:\n",
+}
+OTHER_ISSUES_HEADER = "❗ Other Issues:\n"
+BLOCK_MESSAGE_FOOTER = (
+    "💡 To fix: Address the issues above, then try completing again.\n"
+    "   Quick fix: Say 'fix the completion issues' and I'll address them."
+)
+
+@lru_cache(maxsize=None)
+def open_repository(path):
+    """libgit2 handle for a repository, opened once per process"""
+    return pygit2.Repository(path)
+
+# Every completion attempt is logged here for learning; the handle stays open for the process
+COMPLETION_LOG = BETTY_DIR / 'completion-blocks.jsonl'
+COMPLETION_LOG_BUFFER_SIZE = 65536
+COMPLETION_LOG_HANDLE = None
+
+def log_completion(issues, blocked):
+    """Append one completion attempt to COMPLETION_LOG"""
+    global COMPLETION_LOG_HANDLE
+    if COMPLETION_LOG_HANDLE is None:
+        COMPLETION_LOG_HANDLE = COMPLETION_LOG.open('a', buffering=COMPLETION_LOG_BUFFER_SIZE)
+        atexit.register(COMPLETION_LOG_HANDLE.close)
+    COMPLETION_LOG_HANDLE.write(JSON_DUMPS({
+        'timestamp': datetime.now().isoformat(),
+        'issues': issues,
+        'blocked': blocked
+    }) + '\n')
+    COMPLETION_LOG_HANDLE.flush()
 
 class SmartCompletionGuardian:
-    def __init__(self):
-        self.betty_dir = Path('/home/jarvis/projects/Betty')
-        self.completion_patterns = [
-            'all done', 'complete', 'finished', 'ready', 
-            'all set', "that's it", 'task complete'
-        ]
-        
     def should_check(self, tool_input):
         """Check if this might be a completion attempt"""
         if tool_input.get('tool_name') != 'Bash':
             return False
             
-        command = tool_input.get('tool_input', {}).get('command', '').lower()
+        command = tool_input.get('tool_input', {}).get('command', '')
         
-        # Check for completion patterns in echo/print commands
-        if 'echo' in command or 'print' in command:
-            for pattern in self.completion_patterns:
-                if pattern in command.lower():
-                    return True
+        # Only echo/print commands can announce completion; most Bash calls stop here
+        if 'echo' not in command and 'print' not in command:
+            return False
         
-        return False
+        return COMPLETION_RE.search(command) is not None
     
     def run_checks(self):
         """Run all quality checks and return issues"""
-        issues = []
-        
-        # 1. Check for syntax errors in JavaScript/TypeScript
-        js_check = self.check_javascript()
-        if js_check['errors']:
-            issues.extend(js_check['errors'])
-        
-        # 2. Check for Python syntax/imports
-        py_check = self.check_python()
-        if py_check['errors']:
-            issues.extend(py_check['errors'])
+        # Both Node checks need package.json; stat it once for the pair
+        has_package_json = (BETTY_DIR / 'package.json').is_file()
         
-        # 3. Check for Docker/YAML issues
-        docker_check = self.check_docker()
-        if docker_check['errors']:
-            issues.extend(docker_check['errors'])
-        
-        # 4. Run quick lint check
-        lint_check = self.check_linting()
-        if lint_check['errors']:
-            issues.extend(lint_check['errors'])
+        checks = [
+            partial(self.check_javascript, has_package_json),  # 1. Syntax errors in JavaScript/TypeScript
+            self.check_python,                                 # 2. Python syntax/imports
+            self.check_docker,                                 # 3. Docker/YAML issues
+            partial(self.check_linting, has_package_json),     # 4. Quick lint check
+            self.check_git_status,                             # 5. Uncommitted changes
+        ]
         
-        # 5. Check for uncommitted changes
-        git_check = self.check_git_status()
-        if git_check['warnings']:
-            issues.extend(git_check['warnings'])
+        # The checks are independent and mostly wait on subprocesses, so run them
+        # side by side; results are still collected in the order above
+        issues = []
+        with ThreadPoolExecutor(max_workers=len(checks)) as executor:
+            futures = [executor.submit(check) for check in checks]
+            for future in futures:
+                result = future.result()
+                issues.extend(result.get('errors', []))
+                issues.extend(result.get('warnings', []))
         
         return issues
     
-    def check_javascript(self):
+    def run_tool(self, args, timeout=None):
+        """Run a command without a shell, stderr merged into stdout; None if it isn't installed"""
+        try:
+            result = subprocess.run(
+                args,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                timeout=timeout,
+                cwd=BETTY_DIR
+            )
+        except FileNotFoundError:
+            return None
+        
+        # Captured as bytes; only the head that can hold reportable errors gets decoded
+        result.stdout = result.stdout[:OUTPUT_LIMIT].decode('utf-8', errors='replace')
+        return result
+    
+    def check_javascript(self, has_package_json):
         """Quick JavaScript/TypeScript checks"""
         errors = []
         
-        # Check if package.json exists
-        package_json = self.betty_dir / 'package.json'
-        if package_json.exists():
-            # Try to run type check
-            result = subprocess.run(
-                'npm run type-check 2>&1 || npx tsc --noEmit 2>&1 || true',
-                shell=True,
-                capture_output=True,
-                text=True,
-                timeout=10,
-                cwd=self.betty_dir
-            )
+        # Only a Node project has anything to type-check
+        if has_package_json:
+            # Try to run type check, falling back to tsc when there's no type-check script
+            output = ''
+            result = self.run_tool(['npm', 'run', 'type-check'], timeout=10)
+            if result is not None:
+                output = result.stdout
+            if result is None or result.returncode != 0:
+                result = self.run_tool(['npx', 'tsc', '--noEmit'], timeout=10)
+                if result is not None:
+                    output += result.stdout
             
-            if result.stdout or result.stderr:
-                output = result.stdout + result.stderr
+            if output:
                 # Parse TypeScript errors
-                ts_errors = re.findall(r'(.+?)\((\d+),(\d+)\): error TS\d+: (.+)', output)
-                for file_path, line, col, message in ts_errors[:5]:  # Limit to 5
+                for match in islice(TS_ERROR_PATTERN.finditer(output), 5):  # Limit to 5
+                    file_path, line, col, message = match.groups()
                     errors.append({
                         'type': 'typescript',
                         'file': file_path,
@@ -102,89 +197,131 @@ class SmartCompletionGuardian:
         errors = []
         
         # Find Python files modified recently
-        py_files = []
-        try:
-            result = subprocess.run(
-                'find . -name "*.py" -mmin -10 2>/dev/null | head -5',
-                shell=True,
-                capture_output=True,
-                text=True,
-                cwd=self.betty_dir
-            )
-            py_files = result.stdout.strip().split('\n') if result.stdout else []
-        except:
-            pass
+        py_files = list(self.recent_python_files(BETTY_DIR))
         
         for py_file in py_files:
-            if py_file:
-                # Quick syntax check
-                result = subprocess.run(
-                    f'python3 -m py_compile {py_file} 2>&1',
-                    shell=True,
-                    capture_output=True,
-                    text=True,
-                    cwd=self.betty_dir
-                )
-                
-                if result.stderr:
-                    # Parse error
-                    match = re.search(r'File "(.+?)", line (\d+)', result.stderr)
-                    if match:
-                        errors.append({
-                            'type': 'python_syntax',
-                            'file': match.group(1),
-                            'line': match.group(2),
-                            'message': result.stderr.split('\n')[0],
-                            'fix_hint': f"Fix Python syntax at {match.group(1)}:{match.group(2)}"
-                        })
+            # Quick syntax check, compiled by this interpreter rather than a new one per file
+            try:
+                compile(Path(py_file).read_bytes(), py_file, 'exec', dont_inherit=True)
+            except SyntaxError as e:
+                errors.append({
+                    'type': 'python_syntax',
+                    'file': e.filename,
+                    'line': str(e.lineno),
+                    'message': f"{type(e).__name__}: {e.msg}",
+                    'fix_hint': f"Fix Python syntax at {e.filename}:{e.lineno}"
+                })
+            except (OSError, ValueError):
+                continue  # Unreadable, vanished, or not Python source (e.g. null bytes)
         
         return {'errors': errors}
     
+    def recent_python_files(self, root, limit=5, max_age=600):
+        """Yield up to limit .py files under root modified within the last max_age seconds"""
+        cutoff = time.time() - max_age
+        found = 0
+        stack = [str(root)]
+        
+        while stack:
+            try:
+                entries = os.scandir(stack.pop())
+            except OSError:
+                continue
+            
+            with entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in SKIP_DIRS:
+                                stack.append(entry.path)
+                        elif entry.name.endswith('.py') and entry.stat(follow_symlinks=False).st_mtime > cutoff:
+                            yield entry.path
+                            found += 1
+                            if found >= limit:
+                                return
+                    except OSError:
+                        continue
+    
     def check_docker(self):
         """Quick Docker/docker-compose checks"""
         errors = []
         
-        docker_compose = self.betty_dir / 'docker-compose.yml'
+        docker_compose = BETTY_DIR / 'docker-compose.yml'
         if docker_compose.exists():
+            # Syntax errors are caught in-process; docker-compose only runs without
+            # PyYAML or for compose-specific tags (!reset, !override) safe_load can't read
+            if yaml is not None:
+                try:
+                    with open(docker_compose, 'rb') as f:
+                        yaml.safe_load(f)
+                    return {'errors': errors}
+                except yaml.constructor.ConstructorError:
+                    pass
+                except yaml.YAMLError as e:
+                    mark = getattr(e, 'problem_mark', None)
+                    errors.append({
+                        'type': 'docker_compose',
+                        'file': 'docker-compose.yml',
+                        'line': str(mark.line + 1) if mark else '?',
+                        'message': getattr(e, 'problem', None) or str(e),
+                        'fix_hint': 'Fix docker-compose.yml syntax - check YAML formatting'
+                    })
+                    return {'errors': errors}
+                except OSError:
+                    return {'errors': errors}
+            
             # Validate docker-compose
-            result = subprocess.run(
-                'docker-compose config -q 2>&1',
-                shell=True,
-                capture_output=True,
-                text=True,
-                timeout=5,
-                cwd=self.betty_dir
-            )
+            result = self.run_tool(['docker-compose', 'config', '-q'], timeout=5)
             
-            if result.returncode != 0:
+            if result is not None and result.returncode != 0:
                 errors.append({
                     'type': 'docker_compose',
                     'file': 'docker-compose.yml',
-                    'message': result.stderr or result.stdout,
+                    'message': result.stdout,
                     'fix_hint': 'Fix docker-compose.yml syntax - check YAML formatting'
                 })
         
         return {'errors': errors}
     
-    def check_linting(self):
+    def check_linting(self, has_package_json):
         """Quick linting check"""
         errors = []
         
         # Check for ESLint
-        if (self.betty_dir / 'package.json').exists():
-            result = subprocess.run(
-                'npm run lint 2>&1 | head -20',
-                shell=True,
-                capture_output=True,
-                text=True,
-                timeout=10,
-                cwd=self.betty_dir
-            )
+        if has_package_json:
+            try:
+                proc = subprocess.Popen(
+                    ['npm', 'run', 'lint'],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    cwd=BETTY_DIR,
+                    start_new_session=True
+                )
+            except FileNotFoundError:
+                return {'errors': errors}
+            
+            # Kill the whole process group so the linter npm spawned doesn't keep the pipe open
+            def kill_group():
+                try:
+                    os.killpg(proc.pid, signal.SIGKILL)
+                except OSError:
+                    pass
             
-            if 'error' in result.stdout.lower():
+            # Read up to the cap, then stop the linter; a hung one is killed after 10s
+            timer = threading.Timer(10, kill_group)
+            timer.start()
+            try:
+                output = proc.stdout.read(OUTPUT_LIMIT).decode('utf-8', errors='replace')
+            finally:
+                timer.cancel()
+                kill_group()
+                proc.stdout.close()
+                proc.wait()
+            
+            if 'error' in output.lower():
                 # Parse first few errors
-                lint_errors = re.findall(r'(.+?):(\d+):(\d+)\s+error\s+(.+)', result.stdout)
-                for file_path, line, col, message in lint_errors[:3]:
+                for match in islice(LINT_ERROR_PATTERN.finditer(output), 3):
+                    file_path, line, col, message = match.groups()
                     errors.append({
                         'type': 'lint',
                         'file': file_path,
@@ -200,71 +337,126 @@ class SmartCompletionGuardian:
         """Check for uncommitted changes"""
         warnings = []
         
-        result = subprocess.run(
-            'git status --porcelain',
-            shell=True,
-            capture_output=True,
-            text=True,
-            cwd=self.betty_dir
-        )
-        
-        if result.stdout:
-            modified_files = len(result.stdout.strip().split('\n'))
-            if modified_files > 10:
-                warnings.append({
-                    'type': 'git_warning',
-                    'message': f'{modified_files} files have uncommitted changes',
-                    'fix_hint': 'Consider committing changes before marking complete'
-                })
+        modified_files = self.count_uncommitted()
+        if modified_files > 10:
+            warnings.append({
+                'type': 'git_warning',
+                'message': f'{modified_files} files have uncommitted changes',
+                'fix_hint': 'Consider committing changes before marking complete'
+            })
         
         return {'warnings': warnings}
     
+    def count_uncommitted(self):
+        """Number of entries `git status --porcelain` lists for the project"""
+        # Read the status in-process through libgit2 when pygit2 is installed
+        if pygit2 is not None:
+            try:
+                status = open_repository(str(BETTY_DIR)).status(untracked_files='normal')
+                return sum(1 for flags in status.values() if flags & ~pygit2.GIT_STATUS_IGNORED)
+            except Exception:
+                pass  # Not a repository, or a libgit2 too old for this call - ask git itself
+        
+        try:
+            result = subprocess.run(
+                ['git', 'status', '--porcelain'],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                cwd=BETTY_DIR
+            )
+        except FileNotFoundError:
+            return 0
+        
+        output = result.stdout.strip()
+        return output.count(b'\n') + 1 if output else 0
+    
     def format_block_message(self, issues):
         """Format issues into helpful block message"""
         
         if not issues:
             return None
         
-        message = "🛑 Cannot mark complete - found {} issue(s):\n\n".format(len(issues))
+        parts = ["🛑 Cannot mark complete - found {} issue(s):\n\n".format(len(issues))]
         
         # Group by type
-        by_type = {}
+        by_type = defaultdict(list)
         for issue in issues:
-            issue_type = issue.get('type', 'unknown')
-            if issue_type not in by_type:
-                by_type[issue_type] = []
-            by_type[issue_type].append(issue)
+            by_type[issue.get('type', 'unknown')].append(issue)
         
         # Format each type
         for issue_type, type_issues in by_type.items():
-            if issue_type == 'typescript':
-                message += "📘 TypeScript Errors:\n"
-            elif issue_type == 'python_syntax':
-                message += "🐍 Python Syntax Errors:\n"
-            elif issue_type == 'lint':
-                message += "🧹 Linting Errors:\n"
-            elif issue_type == 'docker_compose':
-                message += "🐳 Docker Configuration:\n"
-            elif issue_type == 'git_warning':
-                message += "⚠️ Git Warnings:\n"
-            else:
-                message += "❗ Other Issues:\n"
+            parts.append(ISSUE_TYPE_HEADERS.get(issue_type, OTHER_ISSUES_HEADER))
             
-            for issue in type_issues[:3]:  # Limit to 3 per type
+            for issue in type_issues[:MAX_ISSUES_PER_TYPE]:
                 if 'file' in issue and 'line' in issue:
-                    message += f"  • {issue['file']}:{issue['line']} - {issue.get('message', 'error')[:50]}\n"
+                    parts.append(f"  • {issue['file']}:{issue['line']} - {issue.get('message', 'error')[:50]}\n")
                 else:
-                    message += f"  • {issue.get('message', 'error')[:80]}\n"
+                    parts.append(f"  • {issue.get('message', 'error')[:80]}\n")
                 
                 if 'fix_hint' in issue:
-                    message += f"    → {issue['fix_hint']}\n"
+                    parts.append(f"    → {issue['fix_hint']}\n")
             
-            message += "\n"
+            parts.append("\n")
+        
+        parts.append(BLOCK_MESSAGE_FOOTER)
         
-        message += "💡 To fix: Address the issues above, then try completing again.\n"
-        message += "   Quick fix: Say 'fix the completion issues' and I'll address them."
+        return ''.join(parts)
+    
+    def tree_signature(self):
+        """Newest st_mtime_ns of any project file or directory, plus git's index"""
+        newest = 0
+        root = str(BETTY_DIR)
+        stack = [root]
+        
+        while stack:
+            dir_path = stack.pop()
+            try:
+                entries = os.scandir(dir_path)
+            except OSError:
+                continue
+            
+            # Hook bookkeeping lives only at the top level; a src/state/ deeper down is project code
+            at_root = dir_path == root
+            with entries:
+                for entry in entries:
+                    if entry.name in SKIP_DIRS or (at_root and entry.name in HOOK_DIRS) or entry.path == str(COMPLETION_LOG):
+                        continue
+                    try:
+                        newest = max(newest, entry.stat(follow_symlinks=False).st_mtime_ns)
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                    except OSError:
+                        continue
         
-        return message
+        # Commits and staging change git status without touching the work tree
+        try:
+            index_mtime = os.stat(BETTY_DIR / '.git' / 'index').st_mtime_ns
+        except OSError:
+            index_mtime = 0
+        
+        return [newest, index_mtime]
+    
+    def load_cached_issues(self, signature):
+        """Issues from the last run if the tree is unchanged and the result still fresh"""
+        try:
+            with open(CHECK_CACHE, 'r') as f:
+                cached = json.load(f)
+            if cached['signature'] == signature and time.time() - cached['checked_at'] < CHECK_CACHE_TTL:
+                return cached['issues']
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        return None
+    
+    def save_cached_issues(self, signature, issues):
+        """Persist this run's issues atomically, keyed by the tree signature"""
+        try:
+            CHECK_CACHE.parent.mkdir(parents=True, exist_ok=True)
+            atomic_write_bytes(
+                CHECK_CACHE,
+                dump_json_bytes({'signature': signature, 'checked_at': time.time(), 'issues': issues})
+            )
+        except OSError:
+            pass
     
     def check_completion(self):
         """Main entry point for hook"""
@@ -279,8 +471,12 @@ class SmartCompletionGuardian:
             
             print("🔍 Betty: Checking if ready for completion...", file=sys.stderr)
             
-            # Run all checks
-            issues = self.run_checks()
+            # Run all checks, unless nothing has changed since the last run
+            signature = self.tree_signature()
+            issues = self.load_cached_issues(signature)
+            if issues is None:
+                issues = self.run_checks()
+                self.save_cached_issues(signature, issues)
             
             if issues:
                 # Block completion and provide guidance
@@ -293,13 +489,7 @@ class SmartCompletionGuardian:
                 }))
                 
                 # Log to file for learning
-                from datetime import datetime
-                with open('/home/jarvis/projects/Betty/completion-blocks.jsonl', 'a') as f:
-                    f.write(json.dumps({
-                        'timestamp': datetime.now().isoformat(),
-                        'issues': issues,
-                        'blocked': True
-                    }) + '\n')
+                log_completion(issues, blocked=True)
                 
                 print(f"❌ Betty: Blocked completion - {len(issues)} issues found", file=sys.stderr)
             else:
@@ -307,13 +497,7 @@ class SmartCompletionGuardian:
                 print("✅ Betty: All checks passed - completion allowed", file=sys.stderr)
                 
                 # Log success
-                from datetime import datetime
-                with open('/home/jarvis/projects/Betty/completion-blocks.jsonl', 'a') as f:
-                    f.write(json.dumps({
-                        'timestamp': datetime.now().isoformat(),
-                        'issues': [],
-                        'blocked': False
-                    }) + '\n')
+                log_completion([], blocked=False)
             
         except Exception as e:
             print(f"Completion guardian error: {e}", file=sys.stderr)
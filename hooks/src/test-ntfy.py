@@ -11,6 +11,9 @@ from datetime import datetime
 NTFY_URL = "https://ntfy.da-tech.io"
 NTFY_TOPIC = "Betty"
 
+# One keep-alive session so the test notifications share a single TLS connection
+SESSION = requests.Session()
+
 def test_notification(title, message, priority='default', tags=None):
     """Send test notification to Andre's NTFY server"""
     
@@ -40,7 +43,7 @@ def test_notification(title, message, priority='default', tags=None):
     print(f"Tags: {tags}")
     
     try:
-        response = requests.post(
+        response = SESSION.post(
             url,
             data=message.encode('utf-8'),
             headers=headers,
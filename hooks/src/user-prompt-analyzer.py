@@ -4,25 +4,61 @@ ABOUTME: Betty UserPromptSubmit Hook - Analyzes user intent BEFORE Claude proces
 ABOUTME: Pre-loads context, predicts needs, and prepares workspace proactively
 """
 
-import json
 import sys
 import os
 import re
-import requests
-from datetime import datetime
+import time
+from functools import lru_cache
 from pathlib import Path
 
+from betty_io import dump_json_line, get_log, load_json_bytes
+
+# Set BETTY_NTFY_DISABLE to skip intent notifications
+NTFY_DISABLED = bool(os.environ.get('BETTY_NTFY_DISABLE'))
+
+# Warning triggers, each scanned in one pass; plain substring matches like the `in` checks they replace
+PRIVILEGE_RE = re.compile(r'sudo|root')
+DESTRUCTIVE_RE = re.compile(r'delete|drop|remove|rm -rf', re.IGNORECASE)
+
+# Shared, read-only result for intents with nothing to predict (tuples log as JSON lists)
+NO_PREDICTIONS = {'tools': (), 'files': (), 'commands': ()}
+
+# Intent keywords in priority order. Each branch scans the whole prompt before
+# the next is tried, so an earlier intent wins wherever its word appears
+INTENT_RE = re.compile(
+    # Critical intents
+    r'^(?:.*?(?P<deployment>deploy|production|release)'
+    r'|.*?(?P<security>security|vulnerability|injection)'
+    r'|.*?(?P<emergency>emergency|urgent|critical)'
+    # Development intents
+    r'|.*?(?P<bug_fix>fix|bug|error|broken)'
+    r'|.*?(?P<testing>test|testing|spec)'
+    r'|.*?(?P<refactor>refactor|clean|optimize)'
+    r'|.*?(?P<feature>add|create|implement|build)'
+    # Research intents
+    r'|.*?(?P<research>how|what|why|explain)'
+    r'|.*?(?P<search>find|search|locate|where))',
+    re.DOTALL
+)
+
+@lru_cache(maxsize=256)
+def intent_for(prompt_lower):
+    """Intent label for a lowercased prompt; classification is pure, so repeats come from the cache"""
+    match = INTENT_RE.match(prompt_lower)
+    return match.lastgroup if match else 'general'
+
 class BettyIntentAnalyzer:
     def __init__(self):
         self.betty_dir = Path('/home/jarvis/projects/Betty')
         self.context_cache = self.betty_dir / 'cache' / 'context'
         self.patterns_db = self.betty_dir / 'patterns'
+        self.git_state = None  # (branch, dirty) once git_status() has run
         
     def analyze_prompt(self):
         """Analyze user prompt before Claude processes it"""
         try:
             # Get prompt from stdin
-            hook_data = json.load(sys.stdin)
+            hook_data = load_json_bytes(sys.stdin.buffer.read())
             prompt = hook_data.get('prompt', '')
             
             # Analyze intent
@@ -55,33 +91,7 @@ class BettyIntentAnalyzer:
     
     def classify_intent(self, prompt):
         """Classify user intent from prompt"""
-        prompt_lower = prompt.lower()
-        
-        # Critical intents
-        if any(word in prompt_lower for word in ['deploy', 'production', 'release']):
-            return 'deployment'
-        if any(word in prompt_lower for word in ['security', 'vulnerability', 'injection']):
-            return 'security'
-        if any(word in prompt_lower for word in ['emergency', 'urgent', 'critical']):
-            return 'emergency'
-            
-        # Development intents
-        if any(word in prompt_lower for word in ['fix', 'bug', 'error', 'broken']):
-            return 'bug_fix'
-        if any(word in prompt_lower for word in ['test', 'testing', 'spec']):
-            return 'testing'
-        if any(word in prompt_lower for word in ['refactor', 'clean', 'optimize']):
-            return 'refactor'
-        if any(word in prompt_lower for word in ['add', 'create', 'implement', 'build']):
-            return 'feature'
-            
-        # Research intents
-        if any(word in prompt_lower for word in ['how', 'what', 'why', 'explain']):
-            return 'research'
-        if any(word in prompt_lower for word in ['find', 'search', 'locate', 'where']):
-            return 'search'
-            
-        return 'general'
+        return intent_for(prompt.lower())
     
     def preload_context(self, intent, prompt):
         """Pre-load relevant context based on intent"""
@@ -122,11 +132,11 @@ class BettyIntentAnalyzer:
                 warnings.append("⚠️ Tests are not passing!")
                 
         # Security warnings
-        if 'sudo' in prompt or 'root' in prompt:
+        if PRIVILEGE_RE.search(prompt):
             warnings.append("⚠️ Elevated privileges requested - be careful!")
             
         # Data warnings
-        if any(word in prompt.lower() for word in ['delete', 'drop', 'remove', 'rm -rf']):
+        if DESTRUCTIVE_RE.search(prompt):
             warnings.append("⚠️ Destructive operation detected - ensure backups!")
             
         return warnings
@@ -138,25 +148,28 @@ class BettyIntentAnalyzer:
     
     def predict_needs(self, prompt, intent):
         """Predict what user will likely need"""
-        predictions = {
-            'tools': [],
-            'files': [],
-            'commands': []
-        }
-        
         if intent == 'bug_fix':
-            predictions['tools'] = ['Grep', 'Read', 'Edit', 'Bash']
-            predictions['commands'] = ['npm test', 'docker logs']
+            return {
+                'tools': ['Grep', 'Read', 'Edit', 'Bash'],
+                'files': [],
+                'commands': ['npm test', 'docker logs']
+            }
             
         elif intent == 'deployment':
-            predictions['commands'] = ['git status', 'npm run build', 'docker-compose up']
-            predictions['files'] = ['docker-compose.yml', '.env', 'package.json']
+            return {
+                'tools': [],
+                'files': ['docker-compose.yml', '.env', 'package.json'],
+                'commands': ['git status', 'npm run build', 'docker-compose up']
+            }
             
         elif intent == 'testing':
-            predictions['tools'] = ['Read', 'Write', 'Bash']
-            predictions['commands'] = ['npm test', 'pytest', 'jest']
+            return {
+                'tools': ['Read', 'Write', 'Bash'],
+                'files': [],
+                'commands': ['npm test', 'pytest', 'jest']
+            }
             
-        return predictions
+        return NO_PREDICTIONS
     
     def prepare_workspace(self, predictions):
         """Prepare workspace based on predictions"""
@@ -170,7 +183,9 @@ class BettyIntentAnalyzer:
             self.verify_command_available(cmd)
     
     def notify_andre(self, intent, prompt):
-        """Send NTFY notification for significant intents"""
+        """Send NTFY notification for significant intents from a detached child"""
+        if NTFY_DISABLED:
+            return
         
         if intent == 'deployment':
             title = "🚀 Deployment Request"
@@ -185,50 +200,54 @@ class BettyIntentAnalyzer:
         
         # Send to NTFY
         try:
-            requests.post(
-                'https://ntfy.da-tech.io/Betty',
-                data=message.encode('utf-8'),
-                headers={'Title': title, 'Priority': 'high' if intent == 'emergency' else 'default'},
-                timeout=2
+            # Imported here so ordinary prompts never load it
+            import betty_ntfy
+            betty_ntfy.post_detached(
+                title,
+                message,
+                priority='high' if intent == 'emergency' else 'default'
             )
-        except:
+        except Exception:
             pass  # Don't block on notification failure
     
     def log_intent(self, prompt, intent, predictions):
         """Log intent for Betty's learning"""
         log_entry = {
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
             'prompt': prompt[:200],
             'intent': intent,
             'predictions': predictions
         }
         
         log_file = self.betty_dir / 'logs' / 'intents.jsonl'
-        log_file.parent.mkdir(exist_ok=True)
-        
-        with open(log_file, 'a') as f:
-            f.write(json.dumps(log_entry) + '\n')
+        get_log(str(log_file)).write(dump_json_line(log_entry))
     
     # Helper methods
+    def git_status(self):
+        """Current branch and dirty flag from a single git call, reused for the rest of the prompt"""
+        if self.git_state is None:
+            try:
+                import subprocess
+                result = subprocess.run(['git', 'status', '--porcelain=v2', '--branch'], 
+                                      capture_output=True, text=True, timeout=1)
+                lines = result.stdout.splitlines()
+                branch = next((line[len('# branch.head '):] for line in lines
+                               if line.startswith('# branch.head ')), '')
+                dirty = any(line and not line.startswith('#') for line in lines)
+                self.git_state = (branch, dirty)
+            except:
+                self.git_state = (None, False)  # git unavailable: assume main and clean
+        return self.git_state
+    
     def is_main_branch(self):
         """Check if on main branch"""
-        try:
-            import subprocess
-            result = subprocess.run(['git', 'branch', '--show-current'], 
-                                  capture_output=True, text=True, timeout=1)
-            return result.stdout.strip() in ['main', 'master']
-        except:
-            return True
+        branch, _ = self.git_status()
+        return branch is None or branch in ['main', 'master']
     
     def has_uncommitted_changes(self):
         """Check for uncommitted changes"""
-        try:
-            import subprocess
-            result = subprocess.run(['git', 'status', '--porcelain'], 
-                                  capture_output=True, text=True, timeout=1)
-            return bool(result.stdout.strip())
-        except:
-            return False
+        _, dirty = self.git_status()
+        return dirty
     
     def tests_passing(self):
         """Check if tests are passing (simplified)"""